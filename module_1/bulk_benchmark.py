@@ -0,0 +1,67 @@
+"""
+Compare POST /api/users (one user per request) with POST /api/users/bulk
+Run with: python bulk_benchmark.py [users] [--sqlite]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def make_users(count, prefix):
+    return [{"name": f"User {i}", "email": f"{prefix}{i}@example.com", "age": 18 + i % 60}
+            for i in range(count)]
+
+
+def time_single(client, users):
+    start = time.perf_counter()
+    for user in users:
+        response = client.post('/api/users', json=user)
+        assert response.status_code == 201, response.json
+    return time.perf_counter() - start
+
+
+def time_bulk(client, users, batch_size=1000, ndjson=False):
+    start = time.perf_counter()
+    for i in range(0, len(users), batch_size):
+        batch = users[i:i + batch_size]
+        if ndjson:
+            body = "\n".join(json.dumps(user) for user in batch)
+            response = client.post('/api/users/bulk', data=body, content_type='application/x-ndjson')
+        else:
+            response = client.post('/api/users/bulk', json=batch)
+        assert response.status_code == 201 and not response.json["errors"], response.json
+    return time.perf_counter() - start
+
+
+def run_benchmark(count=5000, sqlite=False):
+    # flask_app reads USERS_DB at import time
+    if sqlite:
+        db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        db_file.close()
+        os.environ['USERS_DB'] = db_file.name
+    import flask_app
+
+    client = flask_app.app.test_client()
+    backend = "SQLite" if sqlite else "in-memory"
+    print(f"Adding {count:,} users ({backend} store)")
+    results = [
+        ("single POST /api/users", time_single(client, make_users(count, "single"))),
+        ("bulk JSON array", time_bulk(client, make_users(count, "array"))),
+        ("bulk NDJSON", time_bulk(client, make_users(count, "ndjson"), ndjson=True)),
+    ]
+    baseline = results[0][1]
+    for label, seconds in results:
+        print(f"  {label:<24} {seconds:7.3f}s  {count / seconds:10,.0f} users/s  "
+              f"{baseline / seconds:6.1f}x")
+
+    flask_app.users.close()
+    if sqlite:
+        os.remove(db_file.name)
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    run_benchmark(int(args[0]) if args else 5000, sqlite='--sqlite' in sys.argv)
@@ -3,21 +3,31 @@ Simple Flask web application example
 Run with: python flask_app.py
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template, request, jsonify, abort, url_for, stream_with_context
+from jinja2 import DictLoader
 import json
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from user_store import UserStore, DuplicateEmailError
+
 app = Flask(__name__)
 
 # Sample data
-users = [
-    {"id": 1, "name": "Alice", "email": "alice@example.com", "age": 25},
-    {"id": 2, "name": "Bob", "email": "bob@example.com", "age": 30},
-    {"id": 3, "name": "Charlie", "email": "charlie@example.com", "age": 35}
+SAMPLE_USERS = [
+    {"name": "Alice", "email": "alice@example.com", "age": 25},
+    {"name": "Bob", "email": "bob@example.com", "age": 30},
+    {"name": "Charlie", "email": "charlie@example.com", "age": 35}
 ]
 
-# HTML template
-HTML_TEMPLATE = """
+# Set USERS_DB to a SQLite file to keep users across restarts
+users = UserStore(SAMPLE_USERS, db_path=os.environ.get('USERS_DB'),
+                  quantiles=(0.5, 0.9, 0.99))
+
+# HTML templates: one base layout and a fragment per page
+BASE_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -41,8 +51,15 @@ HTML_TEMPLATE = """
             <a href="/add-user">Add User</a>
             <a href="/api/users">API</a>
         </div>
-        
-        {% if page == 'home' %}
+        {% block content %}{% endblock %}
+    </div>
+</body>
+</html>
+"""
+
+HOME_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
         <h1>Welcome to Flask Demo</h1>
         <p>This is a simple Flask application demonstrating:</p>
         <ul>
@@ -52,8 +69,12 @@ HTML_TEMPLATE = """
             <li>Data management</li>
         </ul>
         <p>Current time: {{ current_time }}</p>
-        
-        {% elif page == 'users' %}
+{% endblock %}
+"""
+
+USERS_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
         <h1>User List</h1>
         {% for user in users %}
         <div class="user-card">
@@ -62,8 +83,15 @@ HTML_TEMPLATE = """
             <p>Age: {{ user.age }}</p>
         </div>
         {% endfor %}
-        
-        {% elif page == 'add_user' %}
+        {% if next_url %}
+        <p><a href="{{ next_url }}">Next page</a></p>
+        {% endif %}
+{% endblock %}
+"""
+
+ADD_USER_TEMPLATE = """
+{% extends "base.html" %}
+{% block content %}
         <h1>Add New User</h1>
         <form method="POST">
             <div>
@@ -85,93 +113,330 @@ HTML_TEMPLATE = """
         {% if message %}
         <p style="color: green;">{{ message }}</p>
         {% endif %}
+        {% if error %}
+        <p style="color: red;">{{ error }}</p>
         {% endif %}
-    </div>
-</body>
-</html>
+{% endblock %}
 """
 
+# Compiled once here instead of on every render_template_string call
+app.jinja_loader = DictLoader({
+    'base.html': BASE_TEMPLATE,
+    'home.html': HOME_TEMPLATE,
+    'users.html': USERS_TEMPLATE,
+    'add_user.html': ADD_USER_TEMPLATE,
+})
+PAGES = {name: app.jinja_env.get_template(f'{name}.html')
+         for name in ('home', 'users', 'add_user')}
+
+
+class PageCache:
+    """Rendered pages that only depend on the users, keyed by store version.
+
+    Any change to the store bumps users.version, so a cached page is served
+    only while the version it was rendered at is still current. Every
+    offset/after_id combination is its own page, so at most max_pages are
+    kept, least recently used dropped first.
+    """
+
+    def __init__(self, store, max_pages=64):
+        self.store = store
+        self.max_pages = max_pages
+        self._version = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, key):
+        # tag, not version: a restarted or second process reuses version numbers
+        return f"{key}-{self.store.tag}"
+
+    def get(self, key, render):
+        # read the version before rendering, so a concurrent insert can only
+        # make the cached page newer than its version, never older
+        version = self.store.version
+        with self._lock:
+            if self._version == version and key in self._pages:
+                self._pages.move_to_end(key)
+                return self._pages[key]
+        html = render()
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return html     # a newer version is cached already
+            if self._version != version:
+                self._version, self._pages = version, OrderedDict()
+            self._pages[key] = html
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return html
+
+
+page_cache = PageCache(users)
+
+# Pagination: ?limit=&offset= or the keyset cursor ?after_id=, which stays
+# cheap however deep the page is. ?stream=1 sends every user (after after_id)
+# in batches instead of building the whole response in memory.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+STREAM_BUFFER = 200     # template events per chunk written to the client
+
+
+def _int_arg(name, default):
+    value = request.args.get(name, '')
+    if value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if number < 0:
+        raise ValueError(f"{name} must not be negative")
+    return number
+
+
+def page_args():
+    """(offset, limit, after_id) from the query string; raises ValueError"""
+    offset = _int_arg('offset', 0)
+    limit = _int_arg('limit', DEFAULT_PAGE_SIZE)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return offset, limit, _int_arg('after_id', None)
+
+
+def fetch_page(offset, limit, after_id):
+    """One page of users and the after_id of the next page (None on the last)"""
+    page = users.page(offset, limit + 1, after_id)
+    next_after_id = page[limit - 1]['id'] if len(page) > limit else None
+    return page[:limit], next_after_id
+
+
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def iter_users(after_id=None):
+    for batch in users.iter_pages(STREAM_BATCH_SIZE, after_id=after_id):
+        yield from batch
+
+
+def stream_page(template, **context):
+    """Render a template incrementally while the client reads it"""
+    app.update_template_context(context)
+    stream = template.stream(context)
+    stream.enable_buffering(STREAM_BUFFER)
+    return app.response_class(stream_with_context(stream), mimetype='text/html')
+
 @app.route('/')
 def home():
-    return render_template_string(HTML_TEMPLATE, 
-                                page='home', 
+    return render_template(PAGES['home'],
                                 current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
 
 @app.route('/users')
 def show_users():
-    return render_template_string(HTML_TEMPLATE, 
-                                page='users', 
-                                users=users)
+    try:
+        offset, limit, after_id = page_args()
+    except ValueError as e:
+        abort(400, description=str(e))
+    if wants_stream():
+        return stream_page(PAGES['users'], users=iter_users(after_id), next_url=None)
+
+    def render():
+        page, next_after_id = fetch_page(offset, limit, after_id)
+        next_url = None
+        if next_after_id is not None:
+            next_url = url_for('show_users', after_id=next_after_id, limit=limit)
+        return render_template(PAGES['users'], users=page, next_url=next_url)
+
+    key = f'users-{offset}-{limit}-{after_id or 0}'
+    etag = page_cache.etag(key)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(page_cache.get(key, render))
+    response.set_etag(etag)
+    # browsers keep the page but check back every time
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/add-user', methods=['GET', 'POST'])
 def add_user():
     message = None
+    error = None
     if request.method == 'POST':
-        name = request.form.get('name')
-        email = request.form.get('email')
-        age = int(request.form.get('age'))
+        form = {k: request.form[k] for k in ('name', 'email', 'age') if k in request.form}
+        if 'age' in form:
+            try:
+                form['age'] = int(form['age'])
+            except ValueError:
+                pass  # left as text, so validate_user reports it
         
-        new_user = {
-            "id": len(users) + 1,
-            "name": name,
-            "email": email,
-            "age": age
-        }
-        users.append(new_user)
-        message = f"User {name} added successfully!"
+        try:
+            name, email, age = validate_user(form)
+            users.add(name, email, age)
+            message = f"User {name} added successfully!"
+        except ValueError as e:  # includes DuplicateEmailError
+            error = str(e)
     
-    return render_template_string(HTML_TEMPLATE, 
-                                page='add_user', 
-                                message=message)
+    return render_template(PAGES['add_user'],
+                                message=message,
+                                error=error)
 
 # API Endpoints
 @app.route('/api/users', methods=['GET'])
 def api_get_users():
-    return jsonify({"users": users, "count": len(users)})
+    try:
+        offset, limit, after_id = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_stream():
+        def generate():
+            yield '{"users": ['
+            count = 0
+            for batch in users.iter_pages(STREAM_BATCH_SIZE, after_id=after_id):
+                rows = ', '.join(app.json.dumps(user) for user in batch)
+                yield (', ' if count else '') + rows
+                count += len(batch)
+            yield f'], "count": {count}}}'
+        return app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+    page, next_after_id = fetch_page(offset, limit, after_id)
+    return jsonify({"users": page, "count": len(users), "offset": offset, "limit": limit,
+                    "after_id": after_id, "next_after_id": next_after_id})
 
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 def api_get_user(user_id):
-    user = next((u for u in users if u['id'] == user_id), None)
+    user = users.get(user_id)
     if user:
         return jsonify({"user": user})
     return jsonify({"error": "User not found"}), 404
 
+def validate_user(item):
+    """(name, email, age) from a JSON user object; raises ValueError naming the problem"""
+    if not isinstance(item, dict):
+        raise ValueError("Expected a JSON object")
+    missing = [k for k in ('name', 'email', 'age') if k not in item]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    name, email, age = item['name'], item['email'], item['age']
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("name must be a non-empty string")
+    if not isinstance(email, str) or '@' not in email:
+        raise ValueError("email must be an email address")
+    if not isinstance(age, int) or isinstance(age, bool) or age < 0:
+        raise ValueError("age must be a non-negative integer")
+    return name, email, age
+
 @app.route('/api/users', methods=['POST'])
 def api_add_user():
-    data = request.get_json()
-    if not data or not all(k in data for k in ['name', 'email', 'age']):
-        return jsonify({"error": "Missing required fields"}), 400
+    try:
+        name, email, age = validate_user(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    new_user = {
-        "id": len(users) + 1,
-        "name": data['name'],
-        "email": data['email'],
-        "age": data['age']
-    }
-    users.append(new_user)
+    try:
+        new_user = users.add(name, email, age)
+    except DuplicateEmailError as e:
+        return jsonify({"error": str(e)}), 409
     return jsonify({"user": new_user, "message": "User created"}), 201
 
+# Bulk ingestion: a JSON array or NDJSON (one object per line) of users
+MAX_BULK_USERS = 10000
+MAX_BULK_BYTES = 4 * 1024 * 1024    # ample for MAX_BULK_USERS ordinary users
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+
+def iter_ndjson(text):
+    """Parsed objects of an NDJSON body, a ValueError in place of a bad line"""
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"Invalid JSON: {e}")
+
+
+def read_body(limit):
+    """Request body as bytes, or None as soon as it turns out longer than limit"""
+    chunks, size = [], 0
+    while True:
+        chunk = request.stream.read(min(64 * 1024, limit + 1 - size))
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return None
+
+
+@app.route('/api/users/bulk', methods=['POST'])
+def api_add_users_bulk():
+    too_large = jsonify({"error": f"Request body larger than {MAX_BULK_BYTES} bytes"}), 413
+    # Refuse a declared oversized body without reading it, and stop reading
+    # an undeclared (chunked) one as soon as it passes the limit
+    if request.content_length is not None and request.content_length > MAX_BULK_BYTES:
+        return too_large
+    body = read_body(MAX_BULK_BYTES)
+    if body is None:
+        return too_large
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        return jsonify({"error": "Body must be UTF-8"}), 400
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = iter_ndjson(text)
+    else:
+        try:
+            items = json.loads(text)
+        except ValueError:
+            items = None
+        if not isinstance(items, list):
+            return jsonify({"error": "Body must be a JSON array or NDJSON"}), 400
+
+    # One pass: parse (NDJSON), validate and collect, errors keyed by item index
+    valid, positions, errors = [], [], []
+    for index, item in enumerate(items):
+        if index >= MAX_BULK_USERS:
+            return jsonify({"error": f"At most {MAX_BULK_USERS} users per request"}), 413
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            valid.append(validate_user(item))
+            positions.append(index)
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+    if not valid and not errors:
+        return jsonify({"error": "No users in request body"}), 400
+
+    created, duplicates = users.add_many(valid)
+    errors.extend({"index": positions[p], "error": message} for p, message in duplicates.items())
+    errors.sort(key=lambda error: error["index"])
+    created_at = [positions[p] for p in range(len(valid)) if p not in duplicates]
+    return jsonify({
+        "created": [{"index": index, "id": user["id"]} for index, user in zip(created_at, created)],
+        "count": len(created),
+        "errors": errors,
+    }), 201 if created else 400
+
 @app.route('/api/stats')
 def api_stats():
-    if not users:
+    # Aggregates are kept up to date by users.add/remove, so this is O(1)
+    stats = users.stats.snapshot()
+    if not stats["total_users"]:
         return jsonify({"message": "No users found"})
-    
-    ages = [user['age'] for user in users]
-    stats = {
-        "total_users": len(users),
-        "average_age": sum(ages) / len(ages),
-        "min_age": min(ages),
-        "max_age": max(ages)
-    }
     return jsonify(stats)
 
 if __name__ == '__main__':
     print("Starting Flask application...")
     print("Visit http://localhost:5000 to see the app")
     print("API endpoints:")
-    print("  GET /api/users - Get all users")
+    print("  GET /api/users - Get users (?limit=&offset=, ?after_id=, ?stream=1)")
     print("  GET /api/users/<id> - Get specific user")
     print("  POST /api/users - Add new user")
+    print("  POST /api/users/bulk - Add users from a JSON array or NDJSON")
     print("  GET /api/stats - Get user statistics")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
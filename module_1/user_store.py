@@ -0,0 +1,334 @@
+"""
+In-memory user repository for flask_app.py, optionally backed by SQLite
+"""
+
+import bisect
+import heapq
+import math
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when an email address is already registered"""
+
+
+class QuantileSketch:
+    """Streaming quantiles with bounded relative error (DDSketch style)
+
+    Values are counted in logarithmic buckets, so any quantile is within
+    relative_accuracy of a true value. Memory and query time depend on the
+    range of the values, not on how many were added, and values can be
+    removed again by decrementing their bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._buckets = Counter()
+        self._zeros = 0         # values <= 0 have no logarithm
+        self.count = 0
+
+    def _bucket(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value):
+        if value > 0:
+            self._buckets[self._bucket(value)] += 1
+        else:
+            self._zeros += 1
+        self.count += 1
+
+    def remove(self, value):
+        if value > 0:
+            key = self._bucket(value)
+            self._buckets[key] -= 1
+            if not self._buckets[key]:
+                del self._buckets[key]
+        else:
+            self._zeros -= 1
+        self.count -= 1
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = max(math.ceil(q * self.count) - 1, 0)     # nearest rank, 0-based
+        seen = self._zeros
+        if rank < seen:
+            return 0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if rank < seen:
+                # midpoint of the bucket (gamma^(k-1), gamma^k]
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return None
+
+
+class UserStats:
+    """Running age aggregates, updated as users come and go
+
+    count and sum are plain counters. min and max are the tops of a min-heap
+    and a max-heap; removed ages are deleted lazily, by popping them once
+    they surface at the top. Reads are O(1) whatever the number of users.
+    """
+
+    def __init__(self, quantiles=None):
+        self.total_users = 0
+        self._ages = 0          # users with a numeric age
+        self._age_sum = 0
+        self._min_heap = []
+        self._max_heap = []
+        # ages deleted but maybe still in a heap, one counter per heap
+        self._min_removed = Counter()
+        self._max_removed = Counter()
+        self.quantiles = tuple(quantiles or ())
+        self._sketch = QuantileSketch() if self.quantiles else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _numeric(age):
+        return isinstance(age, (int, float)) and not isinstance(age, bool)
+
+    @staticmethod
+    def _prune(heap, removed, sign):
+        while heap and removed[sign * heap[0]]:
+            age = sign * heapq.heappop(heap)
+            removed[age] -= 1
+            if not removed[age]:
+                del removed[age]
+
+    def _percentile(self, q, low, high):
+        value = self._sketch.quantile(q)
+        if value is None:
+            return None
+        # a bucket midpoint can fall just outside the observed range
+        return round(min(max(value, low), high), 2)
+
+    def add(self, user):
+        self.add_many([user])
+
+    def add_many(self, users):
+        with self._lock:
+            self.total_users += len(users)
+            ages = [user.get("age") for user in users if self._numeric(user.get("age"))]
+            self._ages += len(ages)
+            self._age_sum += sum(ages)
+            if len(ages) > len(self._min_heap):
+                # rebuilding is O(n + k), cheaper than k pushes for a big batch
+                self._min_heap.extend(ages)
+                self._max_heap.extend(-age for age in ages)
+                heapq.heapify(self._min_heap)
+                heapq.heapify(self._max_heap)
+            else:
+                for age in ages:
+                    heapq.heappush(self._min_heap, age)
+                    heapq.heappush(self._max_heap, -age)
+            if self._sketch is not None:
+                for age in ages:
+                    self._sketch.add(age)
+
+    def remove(self, user):
+        with self._lock:
+            self.total_users -= 1
+            age = user.get("age")
+            if not self._numeric(age):
+                return
+            self._ages -= 1
+            self._age_sum -= age
+            self._min_removed[age] += 1
+            self._max_removed[age] += 1
+            if self._sketch is not None:
+                self._sketch.remove(age)
+            self._prune(self._min_heap, self._min_removed, 1)
+            self._prune(self._max_heap, self._max_removed, -1)
+
+    def snapshot(self):
+        """Current aggregates in the /api/stats shape"""
+        with self._lock:
+            stats = {
+                "total_users": self.total_users,
+                "average_age": self._age_sum / self._ages if self._ages else None,
+                "min_age": self._min_heap[0] if self._min_heap else None,
+                "max_age": -self._max_heap[0] if self._max_heap else None,
+            }
+            if self._sketch is not None:
+                stats["age_percentiles"] = {
+                    f"p{q * 100:g}": self._percentile(q, stats["min_age"], stats["max_age"])
+                    for q in self.quantiles}
+            return stats
+
+
+class UserStore:
+    """Users indexed by id and by email.
+
+    Lookups are dict lookups, so O(1) however many users there are.
+    Writes hold a lock, so ids come from one sequence and two requests
+    can't register the same email at once. With db_path every write goes
+    to SQLite first and the indexes are loaded from it at startup.
+    stats keeps the age aggregates up to date on every add and remove, and
+    version goes up with every change, so callers can tell when anything
+    derived from the users (a rendered page, an ETag) is stale. version
+    restarts at 0 in every process, so anything shared beyond it (ETags)
+    should use tag, which also carries a token unique to this store.
+    """
+
+    def __init__(self, users=None, db_path=None, quantiles=None):
+        self._by_id = {}        # id -> user, in insertion (= id) order
+        self._by_email = {}     # normalized email -> id
+        self._ids = []          # sorted ids, for keyset and offset pages
+        self.stats = UserStats(quantiles)
+        self._next_id = 1
+        self.version = 0
+        self._token = uuid.uuid4().hex
+        self._lock = threading.RLock()
+        self._conn = None
+
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                    age INTEGER
+                )
+            """)
+            loaded = [{"id": user_id, "name": name, "email": email, "age": age}
+                      for user_id, name, email, age in self._conn.execute(
+                          "SELECT id, name, email, age FROM users ORDER BY id")]
+            for user in loaded:
+                self._index(user)
+            self.stats.add_many(loaded)
+
+        # Seed data only goes into an empty store
+        if users and not self._by_id:
+            for user in users:
+                self.add(user["name"], user["email"], user["age"])
+
+    @staticmethod
+    def _email_key(email):
+        return email.strip().lower()
+
+    def _index(self, user):
+        self._by_id[user["id"]] = user
+        if self._ids and user["id"] < self._ids[-1]:
+            bisect.insort(self._ids, user["id"])
+        else:
+            self._ids.append(user["id"])
+        self._by_email[self._email_key(user["email"])] = user["id"]
+        self._next_id = max(self._next_id, user["id"] + 1)
+
+    def add(self, name, email, age):
+        """Create a user with the next id; raises DuplicateEmailError"""
+        with self._lock:
+            if self._email_key(email) in self._by_email:
+                raise DuplicateEmailError(f"Email {email} is already registered")
+            user = {"id": self._next_id, "name": name, "email": email, "age": age}
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)",
+                                       (user["id"], name, email, age))
+            self._index(user)
+            self.stats.add(user)
+            self.version += 1
+            return user
+
+    def add_many(self, records):
+        """Create users from (name, email, age) tuples as one batch.
+
+        Ids are assigned as a single contiguous block under one lock, the
+        batch is written in one SQLite transaction, and stats and version are
+        updated once. Emails already registered (or repeated earlier in the
+        batch) are skipped rather than raised. Returns (created users,
+        {position in records: error message}).
+        """
+        created, errors = [], {}
+        with self._lock:
+            seen = set()
+            for position, (name, email, age) in enumerate(records):
+                key = self._email_key(email)
+                if key in self._by_email or key in seen:
+                    errors[position] = f"Email {email} is already registered"
+                    continue
+                seen.add(key)
+                created.append({"id": self._next_id + len(created),
+                                "name": name, "email": email, "age": age})
+            if not created:
+                return created, errors
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO users (id, name, email, age) VALUES (:id, :name, :email, :age)",
+                        created)
+            for user in created:
+                self._index(user)
+            self.stats.add_many(created)
+            self.version += 1
+        return created, errors
+
+    def remove(self, user_id):
+        """Delete a user; returns the removed record or None"""
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if user is None:
+                return None
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            del self._by_id[user_id]
+            del self._ids[bisect.bisect_left(self._ids, user_id)]
+            del self._by_email[self._email_key(user["email"])]
+            self.stats.remove(user)
+            self.version += 1
+            return user
+
+    @property
+    def tag(self):
+        """Version string that never repeats across processes or restarts"""
+        return f"{self._token}-{self.version}"
+
+    def get(self, user_id):
+        return self._by_id.get(user_id)
+
+    def get_by_email(self, email):
+        user_id = self._by_email.get(self._email_key(email))
+        return None if user_id is None else self._by_id.get(user_id)
+
+    def all(self):
+        """Snapshot of all users in id order"""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def page(self, offset=0, limit=None, after_id=None):
+        """Users in id order, starting after after_id (keyset) and/or skipping
+        offset of them, at most limit. Costs O(log n + limit), not O(n)."""
+        with self._lock:
+            start = offset
+            if after_id is not None:
+                start += bisect.bisect_right(self._ids, after_id)
+            stop = None if limit is None else start + limit
+            return [self._by_id[user_id] for user_id in self._ids[start:stop]]
+
+    def iter_pages(self, batch_size=500, after_id=None):
+        """Yield every user in id order as lists of up to batch_size.
+
+        The lock is only held while a batch is copied, so writers are not
+        blocked for the whole iteration; users added meanwhile with a larger
+        id are still picked up.
+        """
+        while True:
+            batch = self.page(limit=batch_size, after_id=after_id)
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1]["id"]
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
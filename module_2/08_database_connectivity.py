@@ -7,11 +7,26 @@ execute SQL queries, and handle results programmatically.
 """
 
 import sqlite3
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import pandas as pd
 from sqlalchemy import create_engine, text
 import os
 from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Callable, Iterator
+from collections import namedtuple, deque
+from contextlib import contextmanager, ExitStack
+import json
+import re
+import threading
+import queue
+import glob
+import gzip
+import shutil
+import tempfile
+from urllib.request import pathname2url
 
 # =====================================================
 # Basic SQLite Connection
@@ -89,6 +104,126 @@ def create_sample_database():
     
     print("Sample database created successfully!")
 
+# =====================================================
+# Query Profiling
+# =====================================================
+
+class QueryProfiler:
+    """Collects per-statement timings and a slow-query log.
+    
+    Statements are grouped by normalized SQL (literals replaced by ?,
+    whitespace collapsed). Any SELECT slower than slow_query_ms gets its
+    EXPLAIN QUERY PLAN captured, with full-table SCANs flagged.
+    """
+    
+    LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+    _LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    _WHITESPACE = re.compile(r"\s+")
+    
+    def __init__(self, slow_query_ms: float = 100.0, slow_log_size: int = 100):
+        self.slow_query_ms = slow_query_ms
+        self.statements: Dict[str, Dict[str, Any]] = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def normalize(cls, sql: str) -> str:
+        """Collapse a statement to its shape so equal queries group together."""
+        sql = cls._LITERALS.sub('?', sql)
+        return cls._WHITESPACE.sub(' ', sql).strip().rstrip(';')
+    
+    def record(self, connection: sqlite3.Connection, sql: str, params, seconds: float, rows: int):
+        """Account one execution; capture the plan if it was slow."""
+        elapsed_ms = seconds * 1000
+        key = self.normalize(sql)
+        with self._lock:
+            entry = self.statements.get(key)
+            if entry is None:
+                entry = self.statements[key] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                    'buckets': [0] * (len(self.LATENCY_BUCKETS_MS) + 1),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['rows'] += rows
+            bucket = next((i for i, limit in enumerate(self.LATENCY_BUCKETS_MS) if elapsed_ms <= limit),
+                          len(self.LATENCY_BUCKETS_MS))
+            entry['buckets'][bucket] += 1
+        
+        if elapsed_ms >= self.slow_query_ms and key.upper().startswith(('SELECT', 'WITH')):
+            plan = self.explain(connection, sql, params)
+            self.slow_queries.append({
+                'sql': key,
+                'ms': elapsed_ms,
+                'rows': rows,
+                'plan': plan,
+                'full_scans': [step for step in plan if self.is_full_scan(step)],
+                'at': datetime.now().isoformat(timespec='seconds'),
+            })
+    
+    @staticmethod
+    def explain(connection: sqlite3.Connection, sql: str, params=None) -> List[str]:
+        try:
+            rows = connection.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+            return [row[3] for row in rows]
+        except sqlite3.Error as e:
+            return [f"EXPLAIN failed: {e}"]
+    
+    @staticmethod
+    def is_full_scan(step: str) -> bool:
+        """SCAN without an index, e.g. 'SCAN employees' (older SQLite: 'SCAN TABLE employees')."""
+        return step.startswith('SCAN') and 'USING' not in step
+    
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.slow_queries.clear()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            statements = {sql: dict(entry, buckets=list(entry['buckets']))
+                          for sql, entry in self.statements.items()}
+            slow = list(self.slow_queries)
+        return {
+            'slow_query_ms': self.slow_query_ms,
+            'latency_buckets_ms': list(self.LATENCY_BUCKETS_MS),
+            'statements': statements,
+            'slow_queries': slow,
+        }
+    
+    @staticmethod
+    def _label(sql: str) -> str:
+        return sql.replace('\\', '\\\\').replace('"', '\\"')
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+    
+    def to_prometheus(self, prefix: str = 'sqlite') -> str:
+        """Render the stats in the Prometheus text exposition format."""
+        data = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Statement latency by normalized SQL.",
+            f"# TYPE {prefix}_query_duration_seconds histogram",
+        ]
+        for sql, entry in data['statements'].items():
+            label = self._label(sql)
+            cumulative = 0
+            for limit, count in zip(self.LATENCY_BUCKETS_MS, entry['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{sql="{label}",le="{limit / 1000}"}} {cumulative}')
+            lines.append(f'{prefix}_query_duration_seconds_bucket{{sql="{label}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'{prefix}_query_duration_seconds_sum{{sql="{label}"}} {entry["total_ms"] / 1000}')
+            lines.append(f'{prefix}_query_duration_seconds_count{{sql="{label}"}} {entry["count"]}')
+        lines.append(f"# HELP {prefix}_query_rows_total Rows returned or affected by normalized SQL.")
+        lines.append(f"# TYPE {prefix}_query_rows_total counter")
+        for sql, entry in data['statements'].items():
+            lines.append(f'{prefix}_query_rows_total{{sql="{self._label(sql)}"}} {entry["rows"]}')
+        lines.append(f"# HELP {prefix}_slow_queries Slow queries currently in the log.")
+        lines.append(f"# TYPE {prefix}_slow_queries gauge")
+        lines.append(f"{prefix}_slow_queries {len(data['slow_queries'])}")
+        return "\n".join(lines) + "\n"
+
 # =====================================================
 # Basic Database Operations
 # =====================================================
@@ -96,9 +231,15 @@ def create_sample_database():
 class DatabaseManager:
     """A class to manage database connections and operations."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, profiler: Optional[QueryProfiler] = None):
         self.db_path = db_path
         self.connection = None
+        self.last_batch_stats = None
+        self.profiler = profiler
+    
+    def _profile(self, query: str, params, seconds: float, rows: int):
+        if self.profiler is not None:
+            self.profiler.record(self.connection, query, params, seconds, rows)
     
     def connect(self):
         """Establish database connection."""
@@ -121,30 +262,79 @@ class DatabaseManager:
             self.connect()
         
         try:
+            started = time.perf_counter()
             cursor = self.connection.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
             
-            # Convert rows to list of dictionaries
+            # Convert rows to list of dictionaries, straight from the cursor
             columns = [description[0] for description in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            
+            results = [dict(zip(columns, row)) for row in cursor]
+            self._profile(query, params, time.perf_counter() - started, len(results))
             return results
         
         except sqlite3.Error as e:
             print(f"Error executing query: {e}")
             return []
     
+    ROW_SHAPES = ('tuple', 'row', 'record')
+    
+    def stream_query(self, query: str, params: tuple = None, batch_size: int = 1000,
+                     row_shape: str = 'tuple') -> Iterator[List]:
+        """Yield the result of a SELECT lazily, one fetchmany batch at a time.
+        
+        row_shape picks what each row is: a plain 'tuple' (cheapest), a
+        sqlite3.Row ('row', access by index or name) or a 'record', a
+        namedtuple built from the column names (attribute access, no
+        per-row dict). Only one batch is in memory at a time.
+        """
+        if row_shape not in self.ROW_SHAPES:
+            raise ValueError(f"row_shape must be one of {self.ROW_SHAPES}")
+        if not self.connection:
+            self.connect()
+        
+        cursor = self.connection.cursor()
+        cursor.row_factory = sqlite3.Row if row_shape == 'row' else None
+        rows = 0
+        elapsed = 0.0  # time spent in SQLite only, not in the consumer
+        try:
+            started = time.perf_counter()
+            cursor.execute(query, params or ())
+            make = None
+            if row_shape == 'record':
+                columns = [description[0] for description in cursor.description]
+                make = namedtuple('Record', columns, rename=True)._make
+            
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not batch:
+                    self._profile(query, params, elapsed, rows)
+                    break
+                rows += len(batch)
+                yield batch if make is None else list(map(make, batch))
+                started = time.perf_counter()
+        
+        except sqlite3.Error as e:
+            print(f"Error streaming query: {e}")
+        finally:
+            cursor.close()
+    
+    def iter_query(self, query: str, params: tuple = None, batch_size: int = 1000,
+                   row_shape: str = 'tuple') -> Iterator:
+        """Yield rows one by one; see stream_query for the row shapes."""
+        for batch in self.stream_query(query, params, batch_size, row_shape):
+            yield from batch
+    
     def execute_non_query(self, query: str, params: tuple = None) -> int:
         """Execute INSERT, UPDATE, or DELETE query."""
         if not self.connection:
             self.connect()
         
         try:
+            started = time.perf_counter()
             cursor = self.connection.cursor()
             if params:
                 cursor.execute(query, params)
@@ -152,6 +342,7 @@ class DatabaseManager:
                 cursor.execute(query)
             
             self.connection.commit()
+            self._profile(query, params, time.perf_counter() - started, cursor.rowcount)
             return cursor.rowcount
         
         except sqlite3.Error as e:
@@ -159,21 +350,102 @@ class DatabaseManager:
             self.connection.rollback()
             return 0
     
-    def execute_many(self, query: str, params_list: List[tuple]) -> int:
-        """Execute query with multiple parameter sets."""
+    @staticmethod
+    def _is_lock_error(error: sqlite3.Error) -> bool:
+        """True for transient "database is locked" / "busy" errors worth retrying."""
+        message = str(error).lower()
+        return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+    
+    def execute_many(self, query: str, params_list: Iterable[tuple],
+                     batch_size: int = 10000, atomic: bool = False,
+                     max_retries: int = 3, retry_delay: float = 0.1,
+                     progress: Optional[Callable[[int, float], None]] = None) -> int:
+        """Execute query with multiple parameter sets, batch by batch.
+        
+        params_list can be any iterable or generator; only one batch is held
+        in memory. Only "database is locked"/"busy" errors are retried, up to
+        max_retries times with exponential backoff.
+        
+        By default each batch is committed in its own transaction. A batch
+        that fails with a data error (e.g. a constraint violation) is rolled
+        back on its own, recorded in last_batch_stats['failed_batches'], and
+        the load moves on; any other OperationalError (missing table, bad
+        SQL) aborts the load and is raised, since no later batch can succeed.
+        
+        With atomic=True the whole call is one transaction: the first batch
+        that fails rolls back every row and the error is raised.
+        """
         if not self.connection:
             self.connect()
         
+        cursor = self.connection.cursor()
+        rows_iter = iter(params_list)
+        started = time.perf_counter()
+        stats = {'rows': 0, 'rows_affected': 0, 'batches': 0, 'failed_batches': []}
+        offset = 0
+        
         try:
-            cursor = self.connection.cursor()
-            cursor.executemany(query, params_list)
-            self.connection.commit()
-            return cursor.rowcount
+            if atomic:
+                cursor.execute("BEGIN")
+            
+            while True:
+                batch = list(islice(rows_iter, batch_size))
+                if not batch:
+                    break
+                
+                attempt = 0
+                while True:
+                    try:
+                        batch_started = time.perf_counter()
+                        if atomic:
+                            cursor.execute("SAVEPOINT batch")
+                        cursor.executemany(query, batch)
+                        affected = max(cursor.rowcount, 0)
+                        if atomic:
+                            cursor.execute("RELEASE SAVEPOINT batch")
+                        else:
+                            self.connection.commit()
+                        stats['rows_affected'] += affected
+                        self._profile(query, None, time.perf_counter() - batch_started, affected)
+                        break
+                    except sqlite3.Error as e:
+                        if atomic:
+                            # undo just this batch so a retry starts clean
+                            cursor.execute("ROLLBACK TO SAVEPOINT batch")
+                            cursor.execute("RELEASE SAVEPOINT batch")
+                        else:
+                            self.connection.rollback()
+                        attempt += 1
+                        if self._is_lock_error(e) and attempt <= max_retries:
+                            time.sleep(retry_delay * 2 ** (attempt - 1))
+                            continue
+                        if atomic or (isinstance(e, sqlite3.OperationalError) and not self._is_lock_error(e)):
+                            raise
+                        print(f"Batch at offset {offset} ({len(batch)} rows) failed: {e}")
+                        stats['failed_batches'].append(
+                            {'offset': offset, 'size': len(batch), 'error': str(e), 'attempts': attempt})
+                        break
+                
+                offset += len(batch)
+                stats['rows'] = offset
+                stats['batches'] += 1
+                if progress:
+                    progress(offset, time.perf_counter() - started)
+            
+            if atomic:
+                self.connection.commit()
         
         except sqlite3.Error as e:
             print(f"Error executing batch query: {e}")
             self.connection.rollback()
-            return 0
+            raise
+        
+        finally:
+            elapsed = time.perf_counter() - started
+            stats['seconds'] = elapsed
+            stats['rows_per_second'] = stats['rows'] / elapsed if elapsed else 0.0
+            self.last_batch_stats = stats
+        return stats['rows_affected']
 
 # =====================================================
 # Using the Database Manager
@@ -243,6 +515,193 @@ def demonstrate_basic_operations():
     finally:
         db.disconnect()
 
+# =====================================================
+# Materialized Aggregates
+# =====================================================
+
+DEPARTMENT_SUMMARY_TABLE = """
+    CREATE TABLE IF NOT EXISTS department_summary (
+        department_id INTEGER PRIMARY KEY,
+        employee_count INTEGER NOT NULL DEFAULT 0,
+        salary_count INTEGER NOT NULL DEFAULT 0,
+        total_payroll REAL NOT NULL DEFAULT 0,
+        avg_salary REAL,
+        min_salary REAL,
+        max_salary REAL
+    )
+"""
+
+# Lets the triggers re-find MIN/MAX of one department with an index seek
+DEPARTMENT_SUMMARY_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_employees_department_salary
+    ON employees(department_id, salary)
+"""
+
+DEPARTMENT_SUMMARY_AGGREGATE = """
+    SELECT 
+        department_id,
+        COUNT(*) as employee_count,
+        COUNT(salary) as salary_count,
+        TOTAL(salary) as total_payroll,
+        AVG(salary) as avg_salary,
+        MIN(salary) as min_salary,
+        MAX(salary) as max_salary
+    FROM employees
+    WHERE department_id IS NOT NULL
+    GROUP BY department_id
+"""
+
+# Trigger steps that add/remove one employee row ({row} is NEW or OLD)
+_SUMMARY_ADD = """
+        INSERT OR IGNORE INTO department_summary (department_id) VALUES ({row}.department_id);
+        UPDATE department_summary SET
+            employee_count = employee_count + 1,
+            salary_count = salary_count + ({row}.salary IS NOT NULL),
+            total_payroll = total_payroll + COALESCE({row}.salary, 0),
+            min_salary = COALESCE(MIN(min_salary, {row}.salary), min_salary, {row}.salary),
+            max_salary = COALESCE(MAX(max_salary, {row}.salary), max_salary, {row}.salary)
+        WHERE department_id = {row}.department_id;
+        UPDATE department_summary SET avg_salary = total_payroll / NULLIF(salary_count, 0)
+        WHERE department_id = {row}.department_id;
+"""
+
+# Removing the current MIN/MAX re-reads it from employees (index seek)
+_SUMMARY_REMOVE = """
+        UPDATE department_summary SET
+            employee_count = employee_count - 1,
+            salary_count = salary_count - ({row}.salary IS NOT NULL),
+            total_payroll = total_payroll - COALESCE({row}.salary, 0),
+            min_salary = CASE WHEN {row}.salary <= min_salary
+                THEN (SELECT MIN(salary) FROM employees WHERE department_id = {row}.department_id)
+                ELSE min_salary END,
+            max_salary = CASE WHEN {row}.salary >= max_salary
+                THEN (SELECT MAX(salary) FROM employees WHERE department_id = {row}.department_id)
+                ELSE max_salary END
+        WHERE department_id = {row}.department_id;
+        UPDATE department_summary SET avg_salary = total_payroll / NULLIF(salary_count, 0)
+        WHERE department_id = {row}.department_id;
+        DELETE FROM department_summary
+        WHERE department_id = {row}.department_id AND employee_count = 0;
+"""
+
+DEPARTMENT_SUMMARY_TRIGGERS = {
+    'trg_department_summary_insert': (
+        "AFTER INSERT ON employees WHEN NEW.department_id IS NOT NULL",
+        _SUMMARY_ADD.format(row='NEW')),
+    'trg_department_summary_delete': (
+        "AFTER DELETE ON employees WHEN OLD.department_id IS NOT NULL",
+        _SUMMARY_REMOVE.format(row='OLD')),
+    'trg_department_summary_update_old': (
+        "AFTER UPDATE OF salary, department_id ON employees WHEN OLD.department_id IS NOT NULL",
+        _SUMMARY_REMOVE.format(row='OLD')),
+    'trg_department_summary_update_new': (
+        "AFTER UPDATE OF salary, department_id ON employees WHEN NEW.department_id IS NOT NULL",
+        _SUMMARY_ADD.format(row='NEW')),
+}
+
+SUMMARY_COLUMNS = ('employee_count', 'salary_count', 'total_payroll',
+                   'avg_salary', 'min_salary', 'max_salary')
+
+def _create_summary_triggers(conn: sqlite3.Connection):
+    for name, (event, body) in DEPARTMENT_SUMMARY_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+def _drop_summary_triggers(conn: sqlite3.Connection):
+    for name in DEPARTMENT_SUMMARY_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+def refresh_department_summary(conn: sqlite3.Connection):
+    """Rebuild department_summary from scratch in one transaction."""
+    with conn:
+        conn.execute("DELETE FROM department_summary")
+        conn.execute(f"INSERT INTO department_summary (department_id, {', '.join(SUMMARY_COLUMNS)}) "
+                     f"{DEPARTMENT_SUMMARY_AGGREGATE}")
+
+def create_department_summary(conn: sqlite3.Connection, rebuild: bool = True):
+    """Create the materialized department_summary table and its triggers.
+    
+    Triggers on employees keep count, total payroll, average, min and max
+    salary per department current on every insert, update and delete, so
+    readers get O(departments) rows instead of aggregating all employees.
+    A department_summary left over from the old pandas demo (keyed by
+    name, no triggers) is replaced.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(department_summary)")}
+    with conn:
+        if columns and 'department_id' not in columns:
+            conn.execute("DROP TABLE department_summary")
+        conn.execute(DEPARTMENT_SUMMARY_TABLE)
+        conn.execute(DEPARTMENT_SUMMARY_INDEX)
+        _create_summary_triggers(conn)
+    if rebuild:
+        refresh_department_summary(conn)
+
+def _summary_triggers_installed(conn: sqlite3.Connection) -> bool:
+    installed = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'employees'")}
+    return set(DEPARTMENT_SUMMARY_TRIGGERS) <= installed
+
+def ensure_department_summary(conn: sqlite3.Connection) -> bool:
+    """Create and fill department_summary unless it is already maintained.
+    
+    Cheap when the triggers are installed: the table is then current and
+    nothing is read. Returns True if the summary had to be built.
+    """
+    if _summary_triggers_installed(conn):
+        return False
+    create_department_summary(conn)
+    return True
+
+def check_department_summary(conn: sqlite3.Connection, tolerance: float = 0.01,
+                             repair: bool = False) -> List[Dict[str, Any]]:
+    """Compare department_summary with a fresh aggregate of employees.
+    
+    Returns one entry per department whose stored values differ by more
+    than tolerance (or that is missing on either side); an empty list
+    means the summary is consistent. With repair=True a mismatch
+    triggers a full rebuild.
+    
+    Writes the triggers can't see leave the summary stale, most notably
+    INSERT OR REPLACE over an existing employee: SQLite only fires delete
+    triggers for REPLACE when PRAGMA recursive_triggers is on.
+    """
+    expected = {row[0]: row[1:] for row in conn.execute(DEPARTMENT_SUMMARY_AGGREGATE)}
+    stored = {row[0]: row[1:] for row in conn.execute(
+        f"SELECT department_id, {', '.join(SUMMARY_COLUMNS)} FROM department_summary")}
+    
+    mismatches = []
+    for department_id in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(department_id), stored.get(department_id)
+        if want is not None and have is not None:
+            differs = [col for col, a, b in zip(SUMMARY_COLUMNS, want, have)
+                       if (a is None) != (b is None) or (a is not None and abs(a - b) > tolerance)]
+            if not differs:
+                continue
+        else:
+            differs = list(SUMMARY_COLUMNS)
+        mismatches.append({
+            'department_id': department_id,
+            'columns': differs,
+            'expected': dict(zip(SUMMARY_COLUMNS, want)) if want else None,
+            'stored': dict(zip(SUMMARY_COLUMNS, have)) if have else None,
+        })
+    
+    if mismatches and repair:
+        refresh_department_summary(conn)
+    return mismatches
+
+@contextmanager
+def department_summary_suspended(conn: sqlite3.Connection):
+    """Drop the summary triggers for a bulk load, then rebuild once."""
+    with conn:
+        _drop_summary_triggers(conn)
+    try:
+        yield conn
+    finally:
+        with conn:
+            _create_summary_triggers(conn)
+        refresh_department_summary(conn)
+
 # =====================================================
 # Using Pandas for Database Operations
 # =====================================================
@@ -288,22 +747,22 @@ def demonstrate_pandas_integration():
         dept_salary = df_employee_dept.groupby('department_name')['salary'].agg(['mean', 'count'])
         print(dept_salary)
         
-        # Write DataFrame back to database
+        # Summary table kept current by triggers; no need to rewrite it
         print("\nCreating summary table...")
-        summary_df = df_employee_dept.groupby('department_name').agg({
-            'salary': ['mean', 'min', 'max', 'count']
-        }).round(2)
-        
-        # Flatten column names
-        summary_df.columns = ['avg_salary', 'min_salary', 'max_salary', 'employee_count']
-        summary_df = summary_df.reset_index()
-        
-        # Write to new table
-        summary_df.to_sql('department_summary', conn, if_exists='replace', index=False)
-        print("Summary table created successfully!")
+        built = ensure_department_summary(conn)
+        print("Summary table built" if built else "Summary table already maintained by triggers")
         
-        # Verify the new table
-        verification = pd.read_sql_query("SELECT * FROM department_summary", conn)
+        # Dashboards read one row per department
+        verification = pd.read_sql_query("""
+            SELECT 
+                d.department_name,
+                ROUND(s.avg_salary, 2) as avg_salary,
+                s.min_salary,
+                s.max_salary,
+                s.employee_count
+            FROM department_summary s
+            JOIN departments d ON s.department_id = d.department_id
+        """, conn)
         print("\nDepartment Summary Table:")
         print(verification)
     
@@ -375,9 +834,18 @@ def demonstrate_sqlalchemy():
 class SafeDatabaseManager:
     """Database manager with comprehensive error handling."""
     
-    def __init__(self, db_path: str):
+    # Only these can be coalesced into executemany
+    _DML = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+    
+    def __init__(self, db_path: str, profiler: Optional[QueryProfiler] = None):
         self.db_path = db_path
         self.connection = None
+        self.profiler = profiler
+        self.last_transaction_stats = None
+    
+    def _profile(self, query: str, params, seconds: float, rows: int):
+        if self.profiler is not None:
+            self.profiler.record(self.connection, query, params, seconds, rows)
     
     def __enter__(self):
         """Context manager entry."""
@@ -408,31 +876,109 @@ class SafeDatabaseManager:
                 print(f"Error closing connection: {e}")
     
     def execute_transaction(self, operations: List[Dict[str, Any]]) -> bool:
-        """Execute multiple operations in a transaction."""
+        """Execute multiple operations in a transaction.
+        
+        The transaction starts with BEGIN IMMEDIATE, taking the write lock
+        up front so concurrent writers wait on busy_timeout instead of
+        deadlocking while upgrading read locks. Consecutive DML operations
+        with identical SQL are coalesced into one executemany call.
+        
+        An operation {'savepoint': name, 'operations': [...]} runs its
+        operations inside a nested SAVEPOINT; if one fails only that group
+        is rolled back and the transaction carries on, unless the group
+        has 'required': True. Groups can nest. If a transaction is already
+        open, the whole call runs as a savepoint within it.
+        
+        Per-step timings are left in last_transaction_stats.
+        """
         if not self.connection:
             raise RuntimeError("No database connection")
         
+        stats = {'steps': [], 'rolled_back': [], 'seconds': 0.0}
+        self.last_transaction_stats = stats
+        started = time.perf_counter()
+        nested = self.connection.in_transaction
+        cursor = self.connection.cursor()
+        
         try:
-            # Start transaction
-            cursor = self.connection.cursor()
+            if nested:
+                cursor.execute("SAVEPOINT execute_transaction")
+            else:
+                cursor.execute("BEGIN IMMEDIATE")
             
-            for operation in operations:
-                query = operation['query']
-                params = operation.get('params', ())
-                
-                if isinstance(params, list):
-                    cursor.executemany(query, params)
-                else:
-                    cursor.execute(query, params)
+            self._run_operations(cursor, operations, None, stats)
             
             # Commit all operations
-            self.connection.commit()
+            if nested:
+                cursor.execute("RELEASE SAVEPOINT execute_transaction")
+            else:
+                self.connection.commit()
             return True
             
         except sqlite3.Error as e:
             print(f"Transaction error: {e}")
-            self.connection.rollback()
+            if nested and self.connection.in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT execute_transaction")
+                cursor.execute("RELEASE SAVEPOINT execute_transaction")
+            else:
+                self.connection.rollback()
             return False
+        
+        finally:
+            stats['seconds'] = time.perf_counter() - started
+    
+    def _run_operations(self, cursor: sqlite3.Cursor, operations: List[Dict[str, Any]],
+                        savepoint: Optional[str], stats: Dict[str, Any]):
+        i = 0
+        while i < len(operations):
+            operation = operations[i]
+            if 'operations' in operation:
+                self._run_savepoint(cursor, operation, stats)
+                i += 1
+                continue
+            
+            query = operation['query']
+            params = operation.get('params', ())
+            end = i + 1
+            if self._DML.match(query):
+                while (end < len(operations) and 'operations' not in operations[end]
+                       and operations[end]['query'] == query):
+                    end += 1
+            
+            started = time.perf_counter()
+            if end - i == 1 and not isinstance(params, list):
+                cursor.execute(query, params)
+            else:
+                batch = []
+                for op in operations[i:end]:
+                    op_params = op.get('params', ())
+                    if isinstance(op_params, list):
+                        batch.extend(op_params)
+                    else:
+                        batch.append(op_params)
+                cursor.executemany(query, batch)
+                params = None
+            elapsed = time.perf_counter() - started
+            rows = max(cursor.rowcount, 0)
+            self._profile(query, params, elapsed, rows)
+            stats['steps'].append({'query': query, 'operations': end - i, 'rows': rows,
+                                   'seconds': elapsed, 'savepoint': savepoint})
+            i = end
+    
+    def _run_savepoint(self, cursor: sqlite3.Cursor, group: Dict[str, Any], stats: Dict[str, Any]):
+        name = group.get('savepoint', 'group')
+        quoted = '"' + name.replace('"', '""') + '"'
+        cursor.execute(f"SAVEPOINT {quoted}")
+        try:
+            self._run_operations(cursor, group['operations'], name, stats)
+            cursor.execute(f"RELEASE SAVEPOINT {quoted}")
+        except sqlite3.Error as e:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {quoted}")
+            cursor.execute(f"RELEASE SAVEPOINT {quoted}")
+            stats['rolled_back'].append({'savepoint': name, 'error': str(e)})
+            if group.get('required'):
+                raise
+            print(f"Rolled back savepoint {name}: {e}")
     
     def get_table_info(self, table_name: str) -> List[Dict]:
         """Get table schema information."""
@@ -456,6 +1002,252 @@ class SafeDatabaseManager:
             print(f"Error getting table info: {e}")
             return []
 
+# =====================================================
+# Read/Write Connection Routing
+# =====================================================
+
+class ConnectionRouter:
+    """One serialized writer and a pool of read-only readers on a WAL database.
+    
+    In WAL mode readers see the last committed snapshot and never wait for
+    the writer, so long imports or rebuilds don't block queries. Readers
+    are opened with a mode=ro URI and PRAGMA query_only, so a misrouted
+    write fails instead of contending for the write lock.
+    """
+    
+    def __init__(self, db_path: str, readers: int = 4, busy_timeout: float = 5.0,
+                 checkout_timeout: float = 10.0):
+        self.db_path = db_path
+        self.checkout_timeout = checkout_timeout
+        self.writer_connection = sqlite3.connect(db_path, timeout=busy_timeout,
+                                                 check_same_thread=False)
+        mode = self.writer_connection.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode.lower() != 'wal':
+            print(f"Warning: {db_path} is in {mode} mode, readers will block on the writer")
+        self.writer_connection.execute("PRAGMA synchronous = NORMAL")
+        self._write_lock = threading.RLock()
+        
+        uri = _readonly_uri(db_path)
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self._readers.put(conn)
+        self._reader_count = readers
+    
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool."""
+        try:
+            conn = self._readers.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No reader available within {self.checkout_timeout}s") from None
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+    
+    @contextmanager
+    def writer(self):
+        """Hold the writer connection; one thread at a time."""
+        with self._write_lock:
+            yield self.writer_connection
+    
+    def close(self):
+        for _ in range(self._reader_count):
+            self._readers.get().close()
+        with self._write_lock:
+            self.writer_connection.close()
+
+class RoutedDatabaseManager(DatabaseManager):
+    """DatabaseManager that sends reads to reader connections and writes to
+    the single writer, so it can be shared between threads.
+    
+    execute_query and stream_query run on a pooled reader; execute_non_query
+    and execute_many hold the writer. self.connection is the connection
+    routed to the current thread's operation, the writer otherwise.
+    """
+    
+    def __init__(self, db_path: str, readers: int = 4, profiler: Optional[QueryProfiler] = None):
+        self._local = threading.local()
+        self._writer = None
+        self.readers = readers
+        self.router = None
+        self._connect_lock = threading.Lock()
+        super().__init__(db_path, profiler=profiler)
+    
+    @property
+    def connection(self):
+        return getattr(self._local, 'conn', None) or self._writer
+    
+    @connection.setter
+    def connection(self, value):
+        self._writer = value
+    
+    @contextmanager
+    def _routed(self, conn: sqlite3.Connection):
+        previous = getattr(self._local, 'conn', None)
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = previous
+    
+    def connect(self):
+        """Open the writer and the reader pool."""
+        with self._connect_lock:
+            if self.router:
+                return
+            try:
+                self.router = ConnectionRouter(self.db_path, readers=self.readers)
+                self.connection = self.router.writer_connection
+                print(f"Connected to database: {self.db_path} (1 writer, {self.readers} readers)")
+            except sqlite3.Error as e:
+                print(f"Error connecting to database: {e}")
+    
+    def disconnect(self):
+        """Close all connections."""
+        if self.router:
+            self.router.close()
+            self.router = self.connection = None
+            print("Database connections closed.")
+    
+    def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
+        if not self.router:
+            self.connect()
+        with self.router.reader() as conn, self._routed(conn):
+            return super().execute_query(query, params)
+    
+    def stream_query(self, query: str, params: tuple = None, batch_size: int = 1000,
+                     row_shape: str = 'tuple') -> Iterator[List]:
+        if not self.router:
+            self.connect()
+        with self.router.reader() as conn:
+            # The cursor binds to the reader on the first step; later steps
+            # run in the consumer's thread without rerouting it
+            with self._routed(conn):
+                batches = super().stream_query(query, params, batch_size, row_shape)
+                first = next(batches, None)
+            if first is not None:
+                yield first
+                yield from batches
+    
+    def execute_non_query(self, query: str, params: tuple = None) -> int:
+        if not self.router:
+            self.connect()
+        with self.router.writer() as conn, self._routed(conn):
+            return super().execute_non_query(query, params)
+    
+    def execute_many(self, query: str, params_list: Iterable[tuple], **kwargs) -> int:
+        if not self.router:
+            self.connect()
+        with self.router.writer() as conn, self._routed(conn):
+            return super().execute_many(query, params_list, **kwargs)
+
+def _make_routing_benchmark_db(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE readings (id INTEGER PRIMARY KEY, sensor INTEGER, value REAL, note TEXT)")
+    conn.executemany("INSERT INTO readings (sensor, value, note) VALUES (?, ?, ?)",
+                     ((i % 100, i * 0.5, 'x' * 100) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def benchmark_connection_routing(rows: int = 200000, duration: float = 2.0,
+                                 reader_threads: int = 4, write_batch: int = 100000) -> Dict[str, Any]:
+    """Measure read throughput while one thread writes as fast as it can.
+    
+    'shared' is the existing setup: a DatabaseManager per thread on a
+    rollback-journal database, where readers and the writer lock each
+    other out. 'routed' shares one RoutedDatabaseManager in WAL mode.
+    Each write batch is one transaction big enough to spill SQLite's page
+    cache, which in rollback-journal mode takes the exclusive lock until
+    commit, like a long import does. Both modes run on scratch databases
+    in a temporary directory.
+    """
+    read_sql = "SELECT COUNT(*), AVG(value) FROM readings WHERE sensor = ?"
+    write_sql = "INSERT INTO readings (sensor, value, note) VALUES (?, ?, ?)"
+    scratch_dir = tempfile.mkdtemp(prefix='routing_benchmark_')
+    results = {}
+    
+    try:
+        for mode in ('shared', 'routed'):
+            path = os.path.join(scratch_dir, f'{mode}.db')
+            _make_routing_benchmark_db(path, rows)
+            routed = RoutedDatabaseManager(path, readers=reader_threads) if mode == 'routed' else None
+            stop = threading.Event()
+            latencies: List[float] = []
+            failed = [0]
+            written = [0]
+            
+            def manager():
+                if routed is not None:
+                    return routed
+                db = DatabaseManager(path)
+                db.connect()
+                return db
+            
+            def read_loop(worker):
+                db = manager()
+                sensor = worker
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    if db.execute_query(read_sql, (sensor % 100,)):
+                        latencies.append(time.perf_counter() - started)
+                    else:  # locked out past the busy timeout
+                        failed[0] += 1
+                    sensor += reader_threads
+                if routed is None:
+                    db.connection.close()
+            
+            def write_loop():
+                db = manager()
+                while not stop.is_set():
+                    written[0] += db.execute_many(
+                        write_sql, ((i % 100, 1.0, 'y' * 100) for i in range(write_batch)),
+                        batch_size=write_batch)
+                if routed is None:
+                    db.connection.close()
+            
+            threads = [threading.Thread(target=write_loop)]
+            threads += [threading.Thread(target=read_loop, args=(i,)) for i in range(reader_threads)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            if routed is not None:
+                routed.disconnect()
+            
+            latencies.sort()
+            results[mode] = {
+                'reads': len(latencies),
+                'reads_per_second': len(latencies) / elapsed,
+                'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+                'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+                'max_ms': latencies[-1] * 1000 if latencies else None,
+                'failed_reads': failed[0],
+                'rows_written': written[0],
+            }
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+    
+    return results
+
+def demonstrate_connection_routing():
+    """Compare reads during heavy writes with and without routing."""
+    
+    results = benchmark_connection_routing(rows=100000, duration=2.0)
+    for mode, r in results.items():
+        latency = (f"p50 {r['p50_ms']:.1f}ms, p99 {r['p99_ms']:.1f}ms, max {r['max_ms']:.1f}ms"
+                   if r['reads'] else "no reads completed")
+        print(f"  {mode}: {r['reads_per_second']:,.0f} reads/sec ({latency}), "
+              f"{r['failed_reads']} failed, {r['rows_written']:,} rows written")
+
 # =====================================================
 # Performance Optimization
 # =====================================================
@@ -500,6 +1292,20 @@ def demonstrate_performance_tips():
         db.connection.commit()
         print(f"Inserted {cursor.rowcount} employees in batch")
         
+        # Repeated statements in a transaction are coalesced; a failing
+        # savepoint group is rolled back without losing the rest
+        raise_query = "UPDATE employees SET salary = salary * 1.01 WHERE employee_id = ?"
+        db.execute_transaction(
+            [{'query': raise_query, 'params': (emp_id,)} for emp_id in (1, 2, 3)] +
+            [{'savepoint': 'new_hire', 'operations': [
+                {'query': "INSERT INTO employees (first_name, last_name) VALUES (?, ?)",
+                 'params': ('Eve', None)},  # violates NOT NULL
+            ]}]
+        )
+        for step in db.last_transaction_stats['steps']:
+            print(f"  {step['operations']} ops, {step['rows']} rows in "
+                  f"{step['seconds'] * 1000:.2f}ms: {step['query'][:40]}")
+        
         # 4. Use EXPLAIN QUERY PLAN to analyze performance
         print("\nQuery execution plan:")
         cursor.execute("""
@@ -512,53 +1318,593 @@ def demonstrate_performance_tips():
         
         for row in cursor.fetchall():
             print(f"  {row[3]}")
+    
+    # 5. Profile queries and log the slow ones with their plans
+    print("\nQuery profiling:")
+    profiler = QueryProfiler(slow_query_ms=0)  # log everything for the demo
+    db = DatabaseManager('company_database.db', profiler=profiler)
+    try:
+        db.execute_query("SELECT * FROM employees WHERE email LIKE ?", ('%@company.com',))
+        db.execute_query("SELECT first_name FROM employees WHERE salary > ?", (80000,))
+    finally:
+        db.disconnect()
+    
+    for entry in profiler.slow_queries:
+        flag = "FULL SCAN" if entry['full_scans'] else "indexed"
+        print(f"  [{flag}] {entry['ms']:.2f}ms, {entry['rows']} rows: {entry['sql']}")
+    print(profiler.to_prometheus().splitlines()[2])
 
 # =====================================================
-# Data Export and Import
+# Index Advisor
 # =====================================================
 
-def export_to_csv():
-    """Export database data to CSV files."""
+# Words that can follow a table name in FROM/JOIN without being an alias
+_NOT_ALIASES = {
+    'WHERE', 'ON', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'FULL', 'NATURAL',
+    'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'UNION', 'EXCEPT', 'INTERSECT', 'USING', 'AS',
+}
+_EQUALITY_OPS = {'=', '==', 'IN', 'IS'}
+_PREDICATE = re.compile(
+    r"(?:\b(\w+)\.)?\b([A-Za-z_]\w*)\s*(==|=|<=|>=|<|>|\bIN\b|\bIS\b|\bBETWEEN\b|\bLIKE\b)", re.I)
+_CLAUSES = re.compile(
+    r"\b(WHERE|ON|GROUP\s+BY|ORDER\s+BY|HAVING|LIMIT|JOIN|LEFT|INNER|UNION|WINDOW)\b", re.I)
+
+def load_workload(paths: List[str]) -> List[str]:
+    """Collect SELECT statements from .sql files and SQL string constants in .py files."""
+    import ast
     
-    conn = sqlite3.connect('company_database.db')
+    statements = []
+    for path in paths:
+        with open(path) as f:
+            source = f.read()
+        if path.endswith('.py'):
+            candidates = [node.value for node in ast.walk(ast.parse(source))
+                          if isinstance(node, ast.Constant) and isinstance(node.value, str)]
+        else:
+            source = re.sub(r'/\*.*?\*/', ' ', source, flags=re.S)
+            source = re.sub(r'--[^\n]*', ' ', source)
+            candidates = source.split(';')
+        for sql in candidates:
+            sql = sql.strip().rstrip(';').strip()
+            if re.match(r'(SELECT|WITH)\b', sql, re.I):
+                statements.append(sql)
+    return list(dict.fromkeys(statements))
+
+def _placeholder_params(sql: str):
+    """Stand-in values for bound parameters so workload queries can run."""
+    names = re.findall(r'(?<!:):([A-Za-z_]\w*)', sql)
+    if names:
+        return {name: 1 for name in names}
+    return (1,) * sql.count('?')
+
+def _query_plan(conn: sqlite3.Connection, sql: str, params) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def _plan_problems(plan: List[str]) -> List[str]:
+    """Steps worth fixing with an index: full-table SCANs and temp B-trees."""
+    problems = []
+    for step in plan:
+        if re.match(r'SCAN (TABLE )?\w+( AS \w+)?$', step) and 'CONSTANT ROW' not in step:
+            problems.append(step)
+        elif 'TEMP B-TREE' in step:
+            problems.append(step)
+    return problems
+
+def _clause_text(sql: str, keyword: str) -> str:
+    """Text of every clause starting with keyword, up to the next clause keyword."""
+    parts = []
+    matches = list(_CLAUSES.finditer(sql))
+    for i, match in enumerate(matches):
+        if re.sub(r'\s+', ' ', match.group(1).upper()) == keyword:
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(sql)
+            parts.append(sql[match.end():end])
+    return ' '.join(parts)
+
+def _table_aliases(sql: str, schema: Dict[str, List[str]]) -> Dict[str, str]:
+    aliases = {}
+    for match in re.finditer(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.I):
+        table, alias = match.group(1).lower(), match.group(2)
+        if table not in schema:
+            continue  # CTE or subquery
+        aliases[table] = table
+        if alias and alias.upper() not in _NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+def _resolve(qualifier: Optional[str], column: str, aliases: Dict[str, str],
+             schema: Dict[str, List[str]]) -> Optional[str]:
+    column = column.lower()
+    if qualifier:
+        table = aliases.get(qualifier.lower())
+        return table if table and column in schema[table] else None
+    tables = {t for t in aliases.values() if column in schema[t]}
+    return tables.pop() if len(tables) == 1 else None
+
+def _rowid_alias(conn: sqlite3.Connection, table: str) -> Optional[str]:
+    """The INTEGER PRIMARY KEY column of a rowid table, if it has one.
+    
+    That column is the rowid, which every index entry already ends with,
+    so it is never worth putting in an index key.
+    """
+    pk = [row for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5]]
+    if len(pk) != 1 or pk[0][2].upper() != 'INTEGER':
+        return None
+    # WITHOUT ROWID tables keep their primary key in an index of origin 'pk'
+    if any(row[3] == 'pk' for row in conn.execute(f'PRAGMA index_list("{table}")')):
+        return None
+    return pk[0][1].lower()
+
+def _candidate_indexes(sql: str, schema: Dict[str, List[str]],
+                       rowid_aliases: Optional[Dict[str, str]] = None) -> set:
+    """Propose (table, columns) indexes from the query's predicates and sort keys."""
+    rowid_aliases = rowid_aliases or {}
+    aliases = _table_aliases(sql, schema)
+    per_table = {table: {'eq': [], 'range': [], 'order': [], 'select': [], 'star': False}
+                 for table in set(aliases.values())}
+    
+    def add(table, kind, column):
+        if table and column != rowid_aliases.get(table) and column not in per_table[table][kind]:
+            per_table[table][kind].append(column)
+    
+    for clause in ('WHERE', 'ON'):
+        for qualifier, column, op in _PREDICATE.findall(_clause_text(sql, clause)):
+            if op.upper() == 'LIKE':
+                op = '<'  # a prefix LIKE behaves like a range
+            table = _resolve(qualifier, column, aliases, schema)
+            add(table, 'eq' if op.upper() in _EQUALITY_OPS else 'range', column.lower())
+    
+    for clause in ('GROUP BY', 'ORDER BY'):
+        for qualifier, column in re.findall(r'(?:\b(\w+)\.)?\b([A-Za-z_]\w*)', _clause_text(sql, clause)):
+            add(_resolve(qualifier, column, aliases, schema), 'order', column.lower())
+    
+    select_list = re.search(r'\bSELECT\s+(.*?)\s+\bFROM\b', sql, re.I | re.S)
+    if select_list:
+        if re.search(r'(^|,|\.)\s*\*', select_list.group(1)):
+            for table in per_table:
+                per_table[table]['star'] = True
+        for qualifier, column in re.findall(r'(?:\b(\w+)\.)?\b([A-Za-z_]\w*)', select_list.group(1)):
+            add(_resolve(qualifier, column, aliases, schema), 'select', column.lower())
+    
+    candidates = set()
+    for table, cols in per_table.items():
+        keys = []
+        for column in cols['eq'] + cols['range']:
+            keys.append((column,))
+        if cols['range']:
+            keys.append(tuple(cols['eq']) + (cols['range'][0],))
+        elif len(cols['eq']) > 1:
+            keys.append(tuple(cols['eq']))
+        if cols['order']:
+            keys.append(tuple(dict.fromkeys(cols['eq'] + cols['order'])))
+        for key in list(keys):
+            candidates.add((table, key))
+            if not cols['star']:
+                extra = [c for c in cols['select'] + cols['order'] if c not in key]
+                if extra and len(key) + len(extra) <= 6:
+                    candidates.add((table, tuple(dict.fromkeys(key + tuple(extra)))))
+    return {(table, key) for table, key in candidates if key}
+
+def _time_query(conn: sqlite3.Connection, sql: str, params, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def _index_name(table: str, columns: tuple) -> str:
+    return f"idx_{table}_{'_'.join(columns)}"
+
+def advise_indexes(db_path: str, workload: List[str], repeat: int = 5,
+                   min_gain: float = 0.2, min_saving_ms: float = 0.5) -> Dict[str, Any]:
+    """Recommend indexes for a workload by trying them on a scratch copy.
+    
+    Each query's EXPLAIN QUERY PLAN is checked for full-table SCANs and
+    TEMP B-TREE sorts. For those queries, single-column, composite and
+    covering indexes are proposed from the WHERE/ON predicates and
+    ORDER BY/GROUP BY keys, then created one at a time on a copy of the
+    database made with backup_database and timed before/after (best of
+    repeat runs). Indexes that cut the affected queries' time by at least
+    min_gain (a fraction) and at least min_saving_ms in total are returned
+    as a DDL migration; the absolute floor keeps timer noise on small
+    tables from deciding. INTEGER PRIMARY KEY columns are left out of
+    index keys since every index already carries the rowid. Bound
+    parameters are replaced with the value 1 so workload queries can run.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix='index_advisor_')
+    scratch = os.path.join(scratch_dir, 'scratch.db')
+    backup_database(db_path, scratch)
+    conn = sqlite3.connect(scratch)
     
     try:
-        # Export employees to CSV
-        df_employees = pd.read_sql_query("""
-            SELECT 
-                e.employee_id,
-                e.first_name,
-                e.last_name,
-                e.email,
-                e.hire_date,
-                e.salary,
-                d.department_name
-            FROM employees e
-            LEFT JOIN departments d ON e.department_id = d.department_id
-        """, conn)
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+        schema = {t.lower(): [row[1].lower() for row in conn.execute(f'PRAGMA table_info("{t}")')]
+                  for t in tables}
+        rowid_aliases = {}
+        for table in tables:
+            alias = _rowid_alias(conn, table)
+            if alias:
+                rowid_aliases[table.lower()] = alias
+        existing = set()
+        for table in tables:
+            for index in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+                cols = tuple(row[2].lower() for row in conn.execute(f'PRAGMA index_info("{index[1]}")'))
+                existing.add((table.lower(), cols))
         
-        df_employees.to_csv('employees_export.csv', index=False)
-        print("Employees exported to employees_export.csv")
+        queries, skipped = [], []
+        for sql in workload:
+            params = _placeholder_params(sql)
+            try:
+                plan = _query_plan(conn, sql, params)
+            except sqlite3.Error as e:
+                skipped.append({'sql': sql, 'error': str(e)})
+                continue
+            queries.append({'sql': sql, 'params': params, 'plan': plan,
+                            'problems': _plan_problems(plan)})
         
-        # Export department summary
-        df_summary = pd.read_sql_query("""
-            SELECT 
-                d.department_name,
-                d.location,
-                d.budget,
-                COUNT(e.employee_id) as employee_count,
-                AVG(e.salary) as avg_salary,
-                SUM(e.salary) as total_payroll
-            FROM departments d
-            LEFT JOIN employees e ON d.department_id = e.department_id
-            GROUP BY d.department_id, d.department_name, d.location, d.budget
-        """, conn)
+        proposals: Dict[tuple, List[int]] = {}
+        for i, query in enumerate(queries):
+            if not query['problems']:
+                continue
+            for candidate in _candidate_indexes(query['sql'], schema, rowid_aliases):
+                if candidate not in existing:
+                    proposals.setdefault(candidate, []).append(i)
+        
+        baseline = {}
+        for i in {i for ids in proposals.values() for i in ids}:
+            baseline[i] = _time_query(conn, queries[i]['sql'], queries[i]['params'], repeat)
+        
+        results = []
+        for (table, columns), ids in proposals.items():
+            name = _index_name(table, columns)
+            ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})"
+            conn.execute(ddl)
+            before = sum(baseline[i] for i in ids)
+            after = sum(_time_query(conn, queries[i]['sql'], queries[i]['params'], repeat) for i in ids)
+            fixed = sum(1 for i in ids
+                        if len(_plan_problems(_query_plan(conn, queries[i]['sql'], queries[i]['params'])))
+                        < len(queries[i]['problems']))
+            conn.execute(f"DROP INDEX {name}")
+            results.append({
+                'table': table, 'columns': list(columns), 'ddl': ddl, 'query_ids': ids,
+                'queries': len(ids), 'plans_improved': fixed,
+                'before_ms': before * 1000, 'after_ms': after * 1000,
+                'gain': (before - after) / before if before else 0.0,
+            })
         
-        df_summary.to_csv('department_summary_export.csv', index=False)
-        print("Department summary exported to department_summary_export.csv")
+        results.sort(key=lambda r: (r['before_ms'] - r['after_ms']), reverse=True)
+        winners, covered = [], set()
+        for result in results:
+            if (result['gain'] < min_gain or not result['plans_improved']
+                    or result['before_ms'] - result['after_ms'] < min_saving_ms):
+                continue
+            # Greedy cover: one index per query, largest saving first
+            if covered.issuperset(result['query_ids']):
+                continue
+            # Skip indexes whose key is a prefix of one already chosen
+            key = tuple(result['columns'])
+            if any(w['table'] == result['table'] and tuple(w['columns'][:len(key)]) == key
+                   for w in winners):
+                continue
+            covered.update(result['query_ids'])
+            winners.append(result)
+        
+        migration = [f"-- Index advisor migration for {os.path.basename(db_path)}, "
+                     f"{datetime.now().isoformat(timespec='seconds')}"]
+        for winner in winners:
+            migration.append(f"-- {winner['queries']} queries, "
+                             f"{winner['before_ms']:.2f}ms -> {winner['after_ms']:.2f}ms")
+            migration.append(winner['ddl'] + ';')
+        if not winners:
+            migration.append(f"-- No index saved at least {min_gain:.0%} and {min_saving_ms}ms")
+        
+        return {
+            'queries': len(queries),
+            'queries_with_problems': sum(1 for q in queries if q['problems']),
+            'skipped': skipped,
+            'candidates': results,
+            'winners': winners,
+            'migration': '\n'.join(migration) + '\n',
+        }
+    
+    finally:
+        conn.close()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+def demonstrate_index_advisor():
+    """Run the index advisor on the module's SQL lessons and the API queries."""
+    
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = sorted(glob.glob(os.path.join(here, '*.sql')))
+    paths.append(os.path.join(here, 'app', 'sql.py'))
+    workload = load_workload([p for p in paths if os.path.exists(p)])
+    
+    report = advise_indexes('company_database.db', workload)
+    print(f"Analyzed {report['queries']} queries ({len(report['skipped'])} skipped), "
+          f"{report['queries_with_problems']} with SCAN/TEMP B-TREE steps")
+    for candidate in report['candidates'][:5]:
+        print(f"  {candidate['ddl']}: {candidate['before_ms']:.2f}ms -> "
+              f"{candidate['after_ms']:.2f}ms over {candidate['queries']} queries")
+    print(report['migration'])
+
+# =====================================================
+# Data Export and Import
+# =====================================================
+
+EXPORT_QUERIES = {
+    'employees_export': """
+        SELECT 
+            e.employee_id,
+            e.first_name,
+            e.last_name,
+            e.email,
+            e.hire_date,
+            e.salary,
+            d.department_name
+        FROM employees e
+        LEFT JOIN departments d ON e.department_id = d.department_id
+    """,
+    'department_summary_export': """
+        SELECT 
+            d.department_name,
+            d.location,
+            d.budget,
+            COALESCE(s.employee_count, 0) as employee_count,
+            s.avg_salary,
+            s.total_payroll
+        FROM departments d
+        LEFT JOIN department_summary s ON d.department_id = s.department_id
+    """,
+}
+
+EXPORT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+def _declared_types(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """Declared type per column name across all tables; None where tables disagree."""
+    declared: Dict[str, Optional[str]] = {}
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    for (table,) in tables:
+        for row in conn.execute(f'PRAGMA table_info("{table}")'):
+            name, decl = row[1].lower(), (row[2] or '').upper()
+            declared[name] = None if name in declared and declared[name] != decl else decl
+    return declared
+
+def _arrow_schema(cursor: sqlite3.Cursor, columns: List[str], first_batch: List[tuple]):
+    """Arrow schema from declared column types, falling back to the first batch."""
+    import pyarrow as pa
+    
+    declared = _declared_types(cursor.connection)
+    fields = []
+    for i, name in enumerate(columns):
+        decl = declared.get(name.lower())
+        if decl and 'INT' in decl:
+            arrow_type = pa.int64()
+        elif decl and any(t in decl for t in ('REAL', 'FLOA', 'DOUB', 'DEC', 'NUMERIC')):
+            arrow_type = pa.float64()
+        elif decl:
+            arrow_type = pa.string()
+        else:
+            # Computed (COUNT, AVG, ...) or ambiguous column: infer from the first
+            # batch. Expressions can return integers in one row and reals in the
+            # next, so integers are widened; all-NULL falls back to string.
+            arrow_type = pa.array([row[i] for row in first_batch]).type
+            if pa.types.is_integer(arrow_type):
+                arrow_type = pa.float64()
+            elif pa.types.is_null(arrow_type):
+                arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+def _arrow_column(values: tuple, field):
+    """Convert one batch column to field's type, raising rather than losing data."""
+    import pyarrow as pa
+    
+    try:
+        return pa.array(values).cast(field.type, safe=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Column {field.name!r} doesn't fit {field.type}: {e}") from e
+
+def _readonly_uri(db_path: str) -> str:
+    """file: URI opening db_path read-only; the path is quoted, so ?, # and % are safe."""
+    return f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+
+def stream_export(db_path: str, query: str, output_path: str, fmt: str = 'csv',
+                  batch_size: int = 10000) -> Dict[str, Any]:
+    """Export a query result without holding it in memory.
+    
+    The cursor is read with fetchmany and each batch is written straight
+    to disk: appended as CSV rows, or as one row group (Parquet) or
+    record batch (Feather) for the columnar formats, which need pyarrow.
+    """
+    if fmt not in EXPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    
+    # Read-only connection, so concurrent exports never take a write lock
+    conn = sqlite3.connect(_readonly_uri(db_path), uri=True)
+    started = time.perf_counter()
+    rows_written = 0
+    
+    try:
+        cursor = conn.execute(query)
+        columns = [description[0] for description in cursor.description]
         
+        if fmt == 'csv':
+            with open(output_path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    writer.writerows(batch)
+                    rows_written += len(batch)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            
+            batch = cursor.fetchmany(batch_size)
+            schema = _arrow_schema(cursor, columns, batch)
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(output_path, schema)
+            else:
+                writer = pa.ipc.new_file(output_path, schema)
+            try:
+                while batch:
+                    table = pa.Table.from_arrays(
+                        [_arrow_column(values, field)
+                         for values, field in zip(zip(*batch), schema)],
+                        schema=schema)
+                    writer.write_table(table)
+                    rows_written += len(batch)
+                    batch = cursor.fetchmany(batch_size)
+            finally:
+                writer.close()
+    finally:
+        conn.close()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'path': output_path,
+        'rows': rows_written,
+        'seconds': elapsed,
+        'rows_per_second': rows_written / elapsed if elapsed else 0.0,
+    }
+
+def export_queries(db_path: str, queries: Dict[str, str], fmt: str = 'csv',
+                   output_dir: str = '.', max_workers: int = 4) -> List[Dict[str, Any]]:
+    """Export several queries at once, each on its own read connection.
+    
+    sqlite3 releases the GIL while SQLite steps through a query, so the
+    exports overlap instead of running back to back.
+    """
+    jobs = {name: os.path.join(output_dir, name + EXPORT_EXTENSIONS[fmt]) for name in queries}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(stream_export, db_path, queries[name], path, fmt)
+                   for name, path in jobs.items()]
+        results = [future.result() for future in futures]
+    
+    for result in results:
+        print(f"Exported {result['rows']:,} rows to {result['path']} in "
+              f"{result['seconds']:.2f}s ({result['rows_per_second']:,.0f} rows/sec)")
+    return results
+
+def export_to_csv(verify: bool = False):
+    """Export database data to CSV files.
+    
+    verify=True re-aggregates employees to check (and repair) the summary
+    first; that is a full scan, so it is for maintenance runs only.
+    """
+    
+    conn = sqlite3.connect('company_database.db')
+    try:
+        if not ensure_department_summary(conn) and verify:
+            mismatches = check_department_summary(conn, repair=True)
+            print(f"Summary checked ({len(mismatches)} departments out of date)")
     finally:
         conn.close()
+    
+    export_queries('company_database.db', EXPORT_QUERIES, fmt='csv')
+
+def bulk_import_csv(db_path: str, csv_path: str, table: str = 'employees',
+                    chunk_size: int = 50000, rows_per_transaction: int = 500000,
+                    rebuild_indexes: bool = False) -> Dict[str, Any]:
+    """Stream a CSV file into a table using batched executemany.
+
+    The file is read chunk by chunk with the csv module, so memory use does
+    not depend on file size. Rows are inserted in large explicit
+    transactions with WAL and synchronous=OFF for the duration of the load.
+    With rebuild_indexes=True the table's non-unique secondary indexes are
+    dropped first and recreated once at the end, which is faster for big
+    loads; UNIQUE indexes are kept so they still reject duplicates.
+    Loads into employees suspend the department_summary triggers and
+    rebuild the summary once afterwards instead of updating it per row.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)  # we issue BEGIN/COMMIT ourselves
+    cursor = conn.cursor()
+    journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+    dropped_indexes = []
+    summary = ExitStack()
+    inserted = 0
+    started = time.perf_counter()
+
+    try:
+        if table == 'employees' and _summary_triggers_installed(conn):
+            summary.enter_context(department_summary_suspended(conn))
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = OFF")
+
+        with open(csv_path, newline='') as f:
+            reader = csv.reader(f)
+            columns = next(reader, None)
+            if columns is None:
+                raise ValueError(f"CSV file has no header: {csv_path}")
+            table_columns = {col['name'] for col in _table_columns(cursor, table)}
+            unknown = [col for col in columns if col not in table_columns]
+            if unknown:
+                raise ValueError(f"CSV columns not in {table}: {unknown}")
+
+            if rebuild_indexes:
+                # UNIQUE indexes stay: without them duplicates would load and
+                # recreating the index afterwards would fail
+                cursor.execute(f'PRAGMA index_list("{table}")')
+                droppable = [row[1] for row in cursor.fetchall() if not row[2] and row[3] == 'c']
+                for name in droppable:
+                    sql = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                         (name,)).fetchone()[0]
+                    cursor.execute(f'DROP INDEX "{name}"')
+                    dropped_indexes.append((name, sql))
+
+            query = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join('?' for _ in columns)})")
+            # Empty CSV fields become NULL, like pandas.to_sql did
+            rows = ([value if value != '' else None for value in row] for row in reader)
+
+            cursor.execute("BEGIN")
+            in_transaction = 0
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                cursor.executemany(query, chunk)
+                inserted += len(chunk)
+                in_transaction += len(chunk)
+                if in_transaction >= rows_per_transaction:
+                    cursor.execute("COMMIT")
+                    cursor.execute("BEGIN")
+                    in_transaction = 0
+            cursor.execute("COMMIT")
+
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Bulk import error after {inserted:,} rows: {e}")
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+
+    finally:
+        for _, sql in dropped_indexes:
+            cursor.execute(sql)
+        summary.close()  # triggers back, summary rebuilt from what was committed
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'rows': inserted,
+        'seconds': elapsed,
+        'rows_per_second': inserted / elapsed if elapsed else 0.0,
+        'indexes_rebuilt': [name for name, _ in dropped_indexes],
+    }
+    print(f"Imported {inserted:,} rows into {table} in {elapsed:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/sec)")
+    return stats
+
+def _table_columns(cursor: sqlite3.Cursor, table: str) -> List[Dict]:
+    """Column names and declared types of a table."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [{'name': row[1], 'type': row[2]} for row in cursor.fetchall()]
 
 def import_from_csv():
     """Import data from CSV files."""
@@ -575,18 +1921,14 @@ def import_from_csv():
     
     sample_data.to_csv('new_employees.csv', index=False)
     
-    # Import the CSV
+    # Import the CSV without loading it into memory
+    stats = bulk_import_csv('company_database.db', 'new_employees.csv')
+    print(f"Imported {stats['rows']} new employees from CSV")
+    
+    # Verify import
     conn = sqlite3.connect('company_database.db')
     
     try:
-        # Read CSV
-        df_new = pd.read_csv('new_employees.csv')
-        
-        # Import to database
-        df_new.to_sql('employees', conn, if_exists='append', index=False)
-        print(f"Imported {len(df_new)} new employees from CSV")
-        
-        # Verify import
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM employees")
         total_count = cursor.fetchone()[0]
@@ -623,73 +1965,376 @@ if __name__ == "__main__":
     
     # Demonstrate export/import
     print("\n5. Data Export/Import:")
-    export_to_csv()
+    export_to_csv(verify=True)
     import_from_csv()
     
+    # Reads keep flowing while a writer is busy
+    print("\n6. Read/Write Connection Routing:")
+    demonstrate_connection_routing()
+    
     print("\n=== Demo Complete ===")
 
 # =====================================================
 # Additional Utility Functions
 # =====================================================
 
-def backup_database(source_db: str, backup_path: str):
-    """Create a backup of the database."""
+BACKUP_METHODS = ('backup', 'vacuum')
+
+class _TooManyRestarts(Exception):
+    """Raised from the backup progress callback to abandon a stepped copy."""
+
+def backup_database(source_db: str, backup_path: str, pages: int = -1,
+                    pause: float = 0.0, progress: Optional[Callable] = None,
+                    method: str = 'backup', compress: bool = False,
+                    max_restarts: int = 10) -> Dict[str, Any]:
+    """Create a backup of the database.
     
-    source_conn = sqlite3.connect(source_db)
-    backup_conn = sqlite3.connect(backup_path)
+    With the default pages=-1 the whole database is copied in one step.
+    A positive pages copies that many pages per step and sleeps pause
+    seconds between steps, so the source read lock is only held briefly
+    and writers can get in between. If another connection writes to the
+    source mid-copy SQLite restarts the copy; restarts are counted and
+    progress(copied, total, restarts) keeps reporting across them. A
+    source that is written faster than it can be stepped through would
+    restart forever, so after max_restarts the rest is copied in one step.
+    
+    method='vacuum' uses VACUUM INTO instead, which writes a compacted,
+    defragmented copy in one read transaction. compress=True gzips the
+    finished snapshot to backup_path + '.gz'.
+    
+    Every method writes to a '.tmp' file next to the backup and only
+    replaces the previous backup once the new one is complete, so a failed
+    run leaves the last good backup in place.
+    """
+    
+    if method not in BACKUP_METHODS:
+        raise ValueError(f"Unknown backup method {method!r}, expected one of {BACKUP_METHODS}")
+    
+    if compress and not backup_path.endswith('.gz'):
+        backup_path += '.gz'
+    partial = backup_path + '.tmp'
+    target = partial
+    if compress:
+        fd, target = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(os.path.abspath(backup_path)))
+        os.close(fd)
+    # VACUUM INTO refuses to overwrite, and leftovers of an earlier failed run are stale
+    for path in {target, partial}:
+        if os.path.exists(path):
+            os.remove(path)
+    
+    report = {'method': method, 'path': backup_path, 'pages': 0, 'steps': 0,
+              'restarts': 0, 'fallback': False, 'seconds': 0.0}
+    started = time.perf_counter()
+    source_conn = None
+    done = False
     
     try:
-        source_conn.backup(backup_conn)
+        source_conn = sqlite3.connect(source_db)
+        if method == 'vacuum':
+            source_conn.execute("VACUUM INTO ?", (target,))
+            report['steps'] = 1
+        else:
+            last_remaining = None
+            
+            def step(status, remaining, total):
+                nonlocal last_remaining
+                if last_remaining is not None and remaining > last_remaining:
+                    report['restarts'] += 1
+                    if report['restarts'] > max_restarts:
+                        raise _TooManyRestarts()
+                last_remaining = remaining
+                report['steps'] += 1
+                report['pages'] = total
+                if progress is not None:
+                    progress(total - remaining, total, report['restarts'])
+                if pause and remaining:
+                    time.sleep(pause)
+            
+            backup_conn = sqlite3.connect(target)
+            try:
+                try:
+                    source_conn.backup(backup_conn, pages=pages, progress=step)
+                except _TooManyRestarts:
+                    report['fallback'] = True
+                    source_conn.backup(backup_conn)
+            finally:
+                backup_conn.close()
+        
+        if compress:
+            with open(target, 'rb') as src, gzip.open(partial, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(partial, backup_path)
+        done = True
+        report['path'] = backup_path
+        
+        report['seconds'] = time.perf_counter() - started
+        report['bytes'] = os.path.getsize(backup_path)
         print(f"Database backed up to {backup_path}")
+        return report
     finally:
-        source_conn.close()
-        backup_conn.close()
+        if source_conn is not None:
+            source_conn.close()
+        leftovers = [target] if compress else []
+        if not done:
+            leftovers.append(partial)
+        for path in leftovers:
+            if os.path.exists(path):
+                os.remove(path)
 
-def get_database_stats(db_path: str) -> Dict[str, Any]:
-    """Get comprehensive database statistics."""
+class DatabaseStats:
+    """Database statistics that avoid a COUNT(*) scan per table.
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    Row counts come from sqlite_stat1. Tables missing from it are
+    ANALYZEd. Growth is checked cheaply with MAX(rowid), one b-tree descent
+    per table: it is recorded whenever a table is analyzed, and when it has
+    moved by more than drift_tolerance of the estimate since then the table
+    is fully re-ANALYZEd (which also keeps the query planner's statistics
+    fresh). MAX(rowid) can't see deletes, and WITHOUT ROWID tables have no
+    rowid at all, so every other table gets a cheap ANALYZE bounded by
+    PRAGMA analysis_limit whenever the data has changed, at most once per
+    reanalyze_interval seconds. Bounded estimates of large tables are
+    approximate; exact=True is there when that matters.
     
-    try:
-        stats = {}
+    Results are cached until PRAGMA data_version moves, i.e. until another
+    connection commits, or until a bounded re-ANALYZE held back by
+    reanalyze_interval is due. exact=True runs COUNT(*) and is cached the
+    same way.
+    Page and byte sizes, free space and fragmentation per table and index
+    (pages=True) walk every page through dbstat, so they are only collected
+    on request and then reused for pages_ttl seconds, writes or not.
+    """
+    
+    def __init__(self, db_path: str, drift_tolerance: float = 0.1, pages_ttl: float = 300.0,
+                 analysis_limit: int = 1000, reanalyze_interval: float = 1.0):
+        self.db_path = db_path
+        self.drift_tolerance = drift_tolerance
+        self.pages_ttl = pages_ttl
+        self.analysis_limit = analysis_limit
+        self.reanalyze_interval = reanalyze_interval
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._exact: Optional[Dict[str, int]] = None
+        self._version = None
+        self._analyzed_at: Dict[str, int] = {}  # MAX(rowid) when each table was last checked
+        self._pages: Optional[Dict[str, Dict[str, Any]]] = None
+        self._pages_at = 0.0
+        self._refreshed_at: Optional[float] = None  # last bounded re-ANALYZE
+        self._refresh_pending = False
+    
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _tables(self) -> List[str]:
+        return [row[0] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_stat%'")]
+    
+    def _max_rowid(self, table: str) -> Optional[int]:
+        """Highest rowid, or None for tables without one (WITHOUT ROWID, virtual)."""
+        try:
+            return self._conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return None
+    
+    def _btree_pages(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Walk every b-tree page once via dbstat; None if it isn't compiled in."""
+        try:
+            pages = self._conn.execute(
+                "SELECT name, pageno, pagetype, ncell, unused, pgsize FROM dbstat ORDER BY name, path")
+        except sqlite3.OperationalError:
+            return None
+        
+        objects: Dict[str, Dict[str, Any]] = {}
+        last_leaf: Dict[str, int] = {}
+        for name, pageno, pagetype, ncell, unused, pgsize in pages:
+            entry = objects.get(name)
+            if entry is None:
+                entry = objects[name] = {'pages': 0, 'bytes': 0, 'unused_bytes': 0,
+                                         'leaf_pages': 0, 'leaf_cells': 0, 'out_of_order': 0}
+            entry['pages'] += 1
+            entry['bytes'] += pgsize
+            entry['unused_bytes'] += unused
+            if pagetype == 'leaf':
+                # Leaves that aren't next to each other on disk cost a seek on scans
+                if name in last_leaf and pageno != last_leaf[name] + 1:
+                    entry['out_of_order'] += 1
+                last_leaf[name] = pageno
+                entry['leaf_pages'] += 1
+                entry['leaf_cells'] += ncell
         
-        # Get all tables
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        tables = [row[0] for row in cursor.fetchall()]
-        stats['tables'] = tables
+        for entry in objects.values():
+            entry['fill'] = 1 - entry['unused_bytes'] / entry['bytes'] if entry['bytes'] else 0.0
+            entry['fragmentation'] = (entry.pop('out_of_order') / (entry['leaf_pages'] - 1)
+                                      if entry['leaf_pages'] > 1 else 0.0)
+        return objects
+    
+    def _page_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-object page stats from dbstat, recollected at most every pages_ttl seconds."""
+        now = time.monotonic()
+        if self._pages is None or now - self._pages_at > self.pages_ttl:
+            btrees = self._btree_pages() or {}
+            kinds = {name: (kind, table) for kind, name, table in self._conn.execute(
+                "SELECT type, name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index')")}
+            self._pages = {}
+            for name, entry in btrees.items():
+                kind, table = kinds.get(name, ('table', name))  # sqlite_schema itself
+                self._pages[name] = dict(entry, type=kind, table=table)
+            self._pages_at = now
+        return self._pages
+    
+    def _stat1_rows(self) -> Dict[str, int]:
+        """Row estimates per table from sqlite_stat1 (first number of each stat)."""
+        try:
+            stat_rows = self._conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+        except sqlite3.OperationalError:  # never analyzed
+            return {}
+        rows: Dict[str, int] = {}
+        for table, stat in stat_rows:
+            rows[table] = max(rows.get(table, 0), int(stat.split()[0]))
+        return rows
+    
+    def _analyze(self, tables: List[str], limit: int = 0):
+        """ANALYZE tables; a non-zero limit samples about that many rows per index."""
+        previous = self._conn.execute("PRAGMA analysis_limit").fetchone()[0]
+        self._conn.execute(f"PRAGMA analysis_limit = {int(limit)}")
+        try:
+            for table in tables:
+                self._conn.execute(f'ANALYZE "{table}"')
+            self._conn.commit()
+        finally:
+            self._conn.execute(f"PRAGMA analysis_limit = {int(previous)}")
+    
+    def _refresh_due(self) -> bool:
+        return (self._refreshed_at is None
+                or time.monotonic() - self._refreshed_at >= self.reanalyze_interval)
+    
+    def _collect(self) -> Dict[str, Any]:
+        tables = self._tables()
+        estimates = self._stat1_rows()
         
-        # Get row counts for each table
-        table_counts = {}
+        stale = []
+        high = {}
         for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            table_counts[table] = cursor.fetchone()[0]
-        stats['row_counts'] = table_counts
+            if table.startswith('sqlite_'):
+                continue
+            top = high[table] = self._max_rowid(table)
+            if table not in estimates:
+                # ANALYZE writes no stat1 row for an empty table
+                if top is None or top > 0:
+                    stale.append(table)
+            elif top is not None:
+                # Until we have seen the table analyzed, compare with the estimate itself
+                reference = self._analyzed_at.get(table, estimates[table])
+                if abs(top - reference) > self.drift_tolerance * max(estimates[table], 1):
+                    stale.append(table)
+                else:
+                    self._analyzed_at.setdefault(table, top)
+        if stale:
+            self._analyze(stale)
+            for table in stale:
+                if high[table] is not None:
+                    self._analyzed_at[table] = high[table]
         
-        # Get database size
-        cursor.execute("PRAGMA page_count")
-        page_count = cursor.fetchone()[0]
-        cursor.execute("PRAGMA page_size")
-        page_size = cursor.fetchone()[0]
-        stats['size_bytes'] = page_count * page_size
+        # Only called once the data changed: catch deletes and WITHOUT ROWID growth
+        refreshed = [table for table in tables if table in estimates and table not in stale
+                     and not table.startswith('sqlite_')]
+        self._refresh_pending = False
+        if refreshed and self._refresh_due():
+            self._analyze(refreshed, limit=self.analysis_limit)
+            self._refreshed_at = time.monotonic()
+        else:
+            self._refresh_pending = bool(refreshed)
+            refreshed = []
+        if stale or refreshed:
+            estimates = self._stat1_rows()
         
-        return stats
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
         
-    finally:
-        conn.close()
+        return {
+            'tables': tables,
+            'row_counts': {table: estimates.get(table, 0) for table in tables},
+            'row_counts_exact': False,
+            'size_bytes': page_count * page_size,
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'free_bytes': freelist_count * page_size,
+            'analyzed': stale,
+            'reanalyzed': refreshed,
+        }
+    
+    def get(self, exact: bool = False, pages: bool = False) -> Dict[str, Any]:
+        """Return cached stats, recollecting only if the database changed."""
+        with self._lock:
+            version = self._data_version()
+            if (version != self._version or self._cached is None
+                    or (self._refresh_pending and self._refresh_due())):
+                self._cached = self._collect()
+                self._exact = None
+                self._version = version
+            stats = dict(self._cached, data_version=version)
+            if exact:
+                if self._exact is None:
+                    self._exact = {table: self._conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                                   for table in stats['tables']}
+                stats['row_counts'] = dict(self._exact)
+                stats['row_counts_exact'] = True
+            if pages:
+                objects = {}
+                for name, entry in self._page_stats().items():
+                    entry = dict(entry)
+                    if entry['type'] == 'table':
+                        entry['rows'] = stats['row_counts'].get(name, entry['leaf_cells'])
+                    objects[name] = entry
+                stats['objects'] = objects
+                stats['objects_age'] = time.monotonic() - self._pages_at
+            return stats
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_stats_services: Dict[str, DatabaseStats] = {}
+_stats_lock = threading.Lock()
+
+def get_database_stats(db_path: str, exact: bool = False, pages: bool = False) -> Dict[str, Any]:
+    """Get comprehensive database statistics.
+    
+    Row counts are sqlite_stat1 estimates unless exact=True; per-object
+    page statistics are only included with pages=True. See DatabaseStats.
+    One cached stats service is kept per database file.
+    """
+    
+    key = os.path.abspath(db_path)
+    with _stats_lock:
+        service = _stats_services.get(key)
+        if service is None:
+            service = _stats_services[key] = DatabaseStats(db_path)
+    return service.get(exact=exact, pages=pages)
 
 # Example usage of utility functions
 def demonstrate_utilities():
     """Demonstrate utility functions."""
     
     print("Database Statistics:")
-    stats = get_database_stats('company_database.db')
+    stats = get_database_stats('company_database.db', pages=True)
     
     print(f"Tables: {', '.join(stats['tables'])}")
     print("Row counts:")
     for table, count in stats['row_counts'].items():
         print(f"  {table}: {count} rows")
     print(f"Database size: {stats['size_bytes']:,} bytes")
+    for name, entry in stats['objects'].items():
+        print(f"  {entry['type']} {name}: {entry['pages']} pages, {entry['bytes']:,} bytes, "
+              f"{entry['fill']:.0%} full, {entry['fragmentation']:.0%} fragmented")
+    
+    exact = get_database_stats('company_database.db', exact=True)
+    print(f"Exact row counts: {exact['row_counts']}")
     
-    # Create backup
-    backup_database('company_database.db', 'company_database_backup.db')
\ No newline at end of file
+    # Create backup, 100 pages at a time so writers aren't stalled
+    report = backup_database('company_database.db', 'company_database_backup.db',
+                             pages=100, pause=0.001)
+    print(f"Copied {report['pages']} pages in {report['steps']} steps "
+          f"({report['restarts']} restarts, {report['seconds']:.3f}s)")
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Benchmarks for the app's data layer, run against a scaled-up copy of VR.db.
+Run with: python benchmark.py [rows]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from cleaning import (EMAIL, ISO_DATE, NON_DIGITS, PHONE, STATUSES, US_DATE, WHITESPACE,
+                      clean_customer_data)
+from columnar import read_sql_columnar
+from db_connect import db_path
+
+FIRST_NAMES = ["John", "Sarah", "Mike", "Emily", "David", "Lisa", "Tom", "Anna", "Chris", "Jessica"]
+LAST_NAMES = ["Smith", "Johnson", "Brown", "Davis", "Wilson", "Anderson", "Taylor", "Martinez", "Garcia", "Lee"]
+
+
+def make_scaled_db(rows: int, path: str) -> str:
+    """Copy VR.db to path and pad the employees table to `rows` rows."""
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+
+    start = target.execute("SELECT COALESCE(MAX(employee_id), 0) FROM employees").fetchone()[0]
+    existing = target.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+    rng = random.Random(42)
+    first_day = date(2015, 1, 1)
+
+    def synthetic(n):
+        for i in range(start + 1, start + 1 + n):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (i, first, last, f"{first.lower()}.{last.lower()}{i}@company.com",
+                   (first_day + timedelta(days=rng.randrange(3650))).isoformat(),
+                   round(rng.uniform(40000, 150000), 2), rng.randint(1, 5),
+                   rng.choice([None, 1, 4, 6]))
+
+    with target:
+        target.executemany("INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           synthetic(max(rows - existing, 0)))
+    target.close()
+    return path
+
+
+def make_messy_db(rows: int, path: str) -> str:
+    """Copy VR.db to path and pad messy_customer_data to `rows` rows of
+    inconsistently formatted customers, about 10% of them repeats."""
+    # backup API rather than a file copy, so pages still in VR.db-wal come along
+    source = sqlite3.connect(db_path)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+
+    start = target.execute("SELECT COALESCE(MAX(id), 0) FROM messy_customer_data").fetchone()[0]
+    existing = target.execute("SELECT COUNT(*) FROM messy_customer_data").fetchone()[0]
+    rng = random.Random(42)
+    cases = [str.lower, str.upper, str.title, lambda s: s]
+    phone_formats = ["({}) {}-{}", "{}.{}.{}", "{}-{}-{}", "({}){}-{}", "{} {} {}", "1{}{}{}", "{}{}"]
+    statuses = ["active", "INACTIVE", "Active", "pending", " Pending ", "unknown", ""]
+
+    def synthetic(n):
+        customers = []
+        for i in range(start + 1, start + 1 + n):
+            if customers and rng.random() < 0.1:
+                customer = rng.choice(customers)  # same person, freshly messed up
+            else:
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                customer = (first, last, f"{first}.{last}{i}@Email.com",
+                            (f"{rng.randrange(200, 999)}", f"{rng.randrange(100, 999)}",
+                             f"{rng.randrange(1000, 9999)}"),
+                            date(2015, 1, 1) + timedelta(days=rng.randrange(3650)))
+                customers.append(customer)
+            first, last, email, phone, day = customer
+            case = rng.choice(cases)
+            name = case(f"{' ' * rng.randrange(3)}{first}{' ' * rng.randrange(1, 4)}{last}{' ' * rng.randrange(2)}")
+            registered = (day.isoformat() if rng.random() < 0.5
+                          else f"{day.month:02d}/{day.day:02d}/{day.year}")
+            if rng.random() < 0.02:
+                registered = "2023-13-45"
+            yield (i, name, f"  {case(email)} " if rng.random() < 0.98 else "invalid-email",
+                   rng.choice(phone_formats).format(*phone), f"{rng.randrange(1, 999)}  Main St, Springfield",
+                   registered, rng.choice(statuses))
+
+    with target:
+        target.executemany("INSERT INTO messy_customer_data VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           synthetic(max(rows - existing, 0)))
+    target.close()
+    return path
+
+
+def _clean_value(value):
+    if value is None:
+        return None
+    text = WHITESPACE.sub(" ", value).strip()
+    return text or None
+
+
+def _clean_record(row: pd.Series) -> tuple:
+    """The row-wise version of cleaning.clean_chunk, one record at a time."""
+    full_name = _clean_value(row["full_name"])
+    first_name = last_name = None
+    if full_name is not None:
+        full_name = full_name.title()
+        first_name, _, last_name = full_name.partition(" ")
+        last_name = last_name or None
+    email = _clean_value(row["email"])
+    email = email.lower() if email is not None and EMAIL.match(email.lower()) else None
+    digits = NON_DIGITS.sub("", row["phone"] or "")
+    phone = PHONE.sub(r"(\1) \2-\3", digits) if PHONE.match(digits) else None
+    registered = _clean_value(row["registration_date"])
+    day = None
+    for pattern, fmt in ((ISO_DATE, "%Y-%m-%d"), (US_DATE, "%m/%d/%Y")):
+        if registered is not None and pattern.match(registered):
+            try:
+                day = datetime.strptime(registered, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                pass
+    status = (_clean_value(row["status"]) or "").lower()
+    return (row["id"], full_name, first_name, last_name, email, phone, _clean_value(row["address"]),
+            day, status if status in STATUSES else "unknown")
+
+
+def clean_chunk_rowwise(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(list(df.apply(_clean_record, axis=1)),
+                        columns=["id", "full_name", "first_name", "last_name", "email", "phone",
+                                 "address", "registration_date", "status"])
+
+
+def best_of(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def peak_memory(func) -> int:
+    """Peak bytes allocated by Python while running func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_read_sql(path: str, sql: str = "SELECT * FROM employees"):
+    """Compare pd.read_sql with the columnar loader on the same query."""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(f"SELECT COUNT(*) FROM ({sql})").fetchone()[0]
+        baseline = best_of(lambda: pd.read_sql(sql, conn))
+        columnar = best_of(lambda: read_sql_columnar(sql, conn))
+        baseline_peak = peak_memory(lambda: pd.read_sql(sql, conn))
+        columnar_peak = peak_memory(lambda: read_sql_columnar(sql, conn))
+    finally:
+        conn.close()
+    mb = 1024 * 1024
+    print(f"read_sql_query on {rows:,} rows")
+    print(f"  pd.read_sql:       {baseline:.3f}s ({rows / baseline:,.0f} rows/s), "
+          f"peak {baseline_peak / mb:,.1f} MB")
+    print(f"  read_sql_columnar: {columnar:.3f}s ({rows / columnar:,.0f} rows/s), "
+          f"peak {columnar_peak / mb:,.1f} MB")
+    print(f"  speedup:           {baseline / columnar:.2f}x")
+
+
+def benchmark_cleaning(path: str, chunk_size: int = 100_000):
+    """Clean messy_customer_data row-wise and vectorized into separate tables."""
+    conn = sqlite3.connect(path)
+    try:
+        rowwise = clean_customer_data(conn, chunk_size, target="clean_rowwise",
+                                      cleaner=clean_chunk_rowwise)
+        vectorized = clean_customer_data(conn, chunk_size, target="clean_vectorized")
+        mismatched = conn.execute(
+            "SELECT COUNT(*) FROM (SELECT * FROM clean_rowwise EXCEPT SELECT * FROM clean_vectorized)"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    rows = vectorized["rows_read"]
+    print(f"clean_customer_data on {rows:,} rows "
+          f"({vectorized['duplicates']:,} duplicates dropped, {mismatched} rows differ)")
+    print(f"  row-wise apply: {rowwise['seconds']:.3f}s ({rowwise['rows_per_second']:,.0f} rows/s)")
+    print(f"  vectorized:     {vectorized['seconds']:.3f}s ({vectorized['rows_per_second']:,.0f} rows/s)")
+    print(f"  speedup:        {rowwise['seconds'] / vectorized['seconds']:.2f}x")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_scaled_db(rows, os.path.join(tmp, "VR_scaled.db"))
+        benchmark_read_sql(path)
+        benchmark_cleaning(make_messy_db(rows, os.path.join(tmp, "VR_messy.db")))
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def cache_key(name: str, params: Optional[Dict[str, Any]] = None) -> Tuple:
+    """Key a result by query name and bound parameters."""
+    return (name, tuple(sorted((params or {}).items())))
+
+
+class ResultCache:
+    """In-process LRU cache of encoded query results.
+
+    Entries expire after ttl seconds and the cache holds at most max_bytes
+    of payload. A dedicated watcher connection polls PRAGMA data_version,
+    which changes whenever any other connection commits to the database,
+    and the whole cache is dropped as soon as it moves.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._watcher = sqlite3.connect(db_path, check_same_thread=False)
+        self._version = self._read_version()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _read_version(self) -> int:
+        return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync_version(self) -> int:
+        """Clear the cache if the database changed (caller holds the lock)."""
+        version = self._read_version()
+        if version != self._version:
+            self._clear()
+            self._version = version
+        return version
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def data_version(self) -> int:
+        """Current database version; pass it to put() to avoid caching stale reads."""
+        with self._lock:
+            return self._sync_version()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            self._sync_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= len(payload)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: Hashable, payload: bytes, version: Optional[int] = None):
+        """Store payload unless it exceeds max_bytes or was read before the last change."""
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            current = self._sync_version()
+            if version is not None and version != current:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (payload, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def invalidate(self):
+        """Drop everything; call after writes made outside another connection."""
+        with self._lock:
+            self._clear()
+
+    def close(self):
+        with self._lock:
+            self._clear()
+            self._watcher.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits,
+                    "misses": self.misses, "invalidations": self.invalidations}
@@ -0,0 +1,166 @@
+import re
+import sqlite3
+import time
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    # .str methods then run in Arrow compute instead of a Python loop
+    STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    STRING_DTYPE = pd.StringDtype()
+
+SOURCE_TABLE = "messy_customer_data"
+CLEAN_TABLE = "clean_customer_data"
+SOURCE_COLUMNS = ["id", "full_name", "email", "phone", "address", "registration_date", "status"]
+CLEAN_COLUMNS = ["id", "full_name", "first_name", "last_name", "email", "phone", "address",
+                 "registration_date", "status", "dedup_key"]
+
+# dedup_key is the hash index: INSERT OR IGNORE drops rows already loaded
+CLEAN_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    email TEXT,
+    phone TEXT,
+    address TEXT,
+    registration_date DATE,
+    status TEXT,
+    dedup_key INTEGER NOT NULL UNIQUE
+)
+"""
+
+# Compiled for row-wise callers; the .str methods get .pattern, because a
+# compiled pattern makes pandas fall back to matching element by element
+WHITESPACE = re.compile(r"\s+")
+NON_DIGITS = re.compile(r"\D+")
+EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PHONE = re.compile(r"^1?(\d{3})(\d{3})(\d{4})$")
+ISO_DATE = re.compile(r"^\d{4}-\d{1,2}-\d{1,2}$")
+US_DATE = re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$")
+STATUSES = ("active", "inactive", "pending")
+
+
+def _text(values: pd.Series) -> pd.Series:
+    """Collapse runs of whitespace and trim; blank strings become NA."""
+    text = values.astype(STRING_DTYPE).str.replace(WHITESPACE.pattern, " ", regex=True).str.strip()
+    return text.where(text.str.len() > 0)
+
+
+def clean_names(names: pd.Series) -> pd.DataFrame:
+    """Title-cased full name plus first name and the rest as last name."""
+    full = _text(names).str.title()
+    first = full.str.replace(r" .*$", "", regex=True)
+    last = full.str.replace(r"^\S+ ?", "", regex=True)
+    return pd.DataFrame({"full_name": full, "first_name": first,
+                         "last_name": last.where(last.str.len() > 0)})
+
+
+def clean_emails(emails: pd.Series) -> pd.Series:
+    """Lower-cased email, NA unless it looks like name@domain.tld."""
+    email = _text(emails).str.lower()
+    return email.where(email.str.match(EMAIL.pattern, na=False))
+
+
+def clean_phones(phones: pd.Series) -> pd.Series:
+    """(XXX) XXX-XXXX for ten-digit numbers (optionally with a leading 1), else NA."""
+    digits = phones.astype(STRING_DTYPE).str.replace(NON_DIGITS.pattern, "", regex=True)
+    valid = digits.str.match(PHONE.pattern, na=False)
+    return digits.str.replace(PHONE.pattern, r"(\1) \2-\3", regex=True).where(valid)
+
+
+def clean_dates(dates: pd.Series) -> pd.Series:
+    """ISO YYYY-MM-DD from YYYY-MM-DD or MM/DD/YYYY input; impossible dates become NA."""
+    text = _text(dates)
+    iso = pd.to_datetime(text.where(text.str.match(ISO_DATE.pattern, na=False)),
+                         format="%Y-%m-%d", errors="coerce")
+    us = pd.to_datetime(text.where(text.str.match(US_DATE.pattern, na=False)),
+                        format="%m/%d/%Y", errors="coerce")
+    days = iso.fillna(us)
+    # numpy formats datetime64[D] in C; dt.strftime goes through Python per value
+    formatted = np.datetime_as_string(days.to_numpy("datetime64[D]"), unit="D")
+    return pd.Series(formatted, index=dates.index, dtype=STRING_DTYPE).where(days.notna())
+
+
+def clean_statuses(statuses: pd.Series) -> pd.Series:
+    status = _text(statuses).str.lower()
+    return status.where(status.isin(STATUSES), "unknown")
+
+
+def clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean one chunk of messy_customer_data with column-wise string ops only."""
+    names = clean_names(df["full_name"])
+    return pd.DataFrame({
+        "id": df["id"],
+        "full_name": names["full_name"],
+        "first_name": names["first_name"],
+        "last_name": names["last_name"],
+        "email": clean_emails(df["email"]),
+        "phone": clean_phones(df["phone"]),
+        "address": _text(df["address"]),
+        "registration_date": clean_dates(df["registration_date"]),
+        "status": clean_statuses(df["status"]),
+    })
+
+
+def dedup_keys(clean: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of the normalized name, email and phone of each row.
+
+    Rows with none of the three can't be matched to anyone, so they hash
+    their own id and are never treated as duplicates.
+    """
+    name = clean["full_name"].fillna("").str.lower()
+    key = name + "|" + clean["email"].fillna("") + "|" + clean["phone"].fillna("")
+    anonymous = clean[["full_name", "email", "phone"]].isna().all(axis=1)
+    key = key.where(~anonymous, "#" + clean["id"].astype(str))
+    return pd.util.hash_pandas_object(key, index=False).to_numpy().view(np.int64)
+
+
+def clean_customer_data(conn: sqlite3.Connection, chunk_size: int = 100_000,
+                        source: str = SOURCE_TABLE, target: str = CLEAN_TABLE,
+                        cleaner: Callable[[pd.DataFrame], pd.DataFrame] = clean_chunk) -> Dict[str, Any]:
+    """Clean source into target chunk by chunk.
+
+    Chunks are read in id order with keyset pagination, cleaned, stripped
+    of duplicates within the chunk, and bulk inserted with INSERT OR
+    IGNORE, so the UNIQUE dedup_key index drops rows seen in earlier
+    chunks (or earlier runs). The first occurrence of a customer wins.
+    """
+    started = time.perf_counter()
+    conn.execute(CLEAN_TABLE_DDL.format(table=target))
+    read = (f"SELECT {', '.join(SOURCE_COLUMNS)} FROM {source} "
+            f"WHERE id > ? ORDER BY id LIMIT ?")
+    insert = (f"INSERT OR IGNORE INTO {target} ({', '.join(CLEAN_COLUMNS)}) "
+              f"VALUES ({', '.join('?' for _ in CLEAN_COLUMNS)})")
+    last_id = conn.execute(f"SELECT COALESCE(MIN(id), 0) - 1 FROM {source}").fetchone()[0]
+    stats = {"rows_read": 0, "rows_written": 0, "duplicates": 0, "chunks": 0}
+
+    while True:
+        rows = conn.execute(read, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        clean = cleaner(pd.DataFrame.from_records(rows, columns=SOURCE_COLUMNS))
+        clean["dedup_key"] = dedup_keys(clean)
+        clean = clean[~clean["dedup_key"].duplicated()]
+
+        records = clean[CLEAN_COLUMNS].astype(object)
+        records = records.where(records.notna(), None)
+        before = conn.total_changes
+        with conn:
+            conn.executemany(insert, records.itertuples(index=False, name=None))
+        written = conn.total_changes - before
+
+        stats["rows_read"] += len(rows)
+        stats["rows_written"] += written
+        stats["duplicates"] += len(rows) - written
+        stats["chunks"] += 1
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_second"] = stats["rows_read"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
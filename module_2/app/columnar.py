@@ -0,0 +1,147 @@
+import sqlite3
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def column_kind(declared: Optional[str]) -> str:
+    """Map a declared SQLite column type to a buffer kind, following
+    SQLite's own affinity rules (INTEGER, DECIMAL, DATE, VARCHAR, ...)."""
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return "int"
+    if "DATE" in declared or "TIME" in declared:
+        return "datetime"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "object"
+    if any(t in declared for t in ("REAL", "FLOA", "DOUB", "DEC", "NUMERIC")):
+        return "float"
+    return "object"
+
+
+def declared_column_types(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """Declared type of every column name in the schema (from sqlite_master).
+
+    A name declared with different types in different tables maps to None,
+    which loads as a plain object column.
+    """
+    types: Dict[str, Optional[str]] = {}
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    for (table,) in tables:
+        for row in conn.execute(f'PRAGMA table_info("{table}")'):
+            name, declared = row[1].lower(), row[2]
+            if name in types and types[name] != declared:
+                types[name] = None
+            else:
+                types[name] = declared
+    return types
+
+
+BUFFER_DTYPES = {
+    "int": np.int64,
+    "float": np.float64,
+    "datetime": "datetime64[ns]",
+    "object": object,
+}
+
+
+class ColumnBuffer:
+    """Growable typed buffer for one result column.
+
+    Values that don't fit the declared type (SQLite is loosely typed)
+    demote the column to object, and NULLs in an integer column are kept
+    in a mask so the result is a nullable Int64 column.
+    """
+
+    def __init__(self, kind: str, capacity: int):
+        self.kind = kind
+        self.data = np.empty(capacity, dtype=BUFFER_DTYPES[kind])
+        self.mask = None
+
+    def grow(self, capacity: int):
+        data = np.empty(capacity, dtype=self.data.dtype)
+        data[:len(self.data)] = self.data
+        self.data = data
+        if self.mask is not None:
+            mask = np.zeros(capacity, dtype=bool)
+            mask[:len(self.mask)] = self.mask
+            self.mask = mask
+
+    def demote(self, filled: int):
+        if self.kind == "datetime":
+            # via microseconds so values become datetime objects, not ns integers
+            data = self.data.astype("datetime64[us]").astype(object)
+        else:
+            data = self.data.astype(object)
+        if self.mask is not None:
+            data[:filled][self.mask[:filled]] = None
+        elif self.kind == "float":
+            data[:filled][np.isnan(self.data[:filled])] = None
+        self.kind, self.data, self.mask = "object", data, None
+
+    def put(self, start: int, values: tuple):
+        end = start + len(values)
+        if self.kind == "int":
+            arr = np.array(values)
+            if arr.dtype.kind != "i":
+                # NULLs (or stray non-integers) force an object array
+                nulls = arr == None  # noqa: E711 - elementwise comparison
+                present = np.array(arr[~nulls].tolist())
+                if present.size and present.dtype.kind != "i":
+                    self.demote(start)
+                    self.data[start:end] = values
+                    return
+                if self.mask is None:
+                    self.mask = np.zeros(len(self.data), dtype=bool)
+                self.mask[start:end] = nulls
+                arr = np.zeros(len(values), dtype=np.int64)
+                arr[~nulls] = present
+            self.data[start:end] = arr
+        elif self.kind in ("float", "datetime"):
+            try:
+                self.data[start:end] = values
+            except (TypeError, ValueError):
+                self.demote(start)
+                self.data[start:end] = values
+        else:
+            self.data[start:end] = values
+
+    def finish(self, filled: int):
+        data = self.data[:filled]
+        if self.mask is not None:
+            return pd.arrays.IntegerArray(data, self.mask[:filled])
+        return data
+
+
+def read_sql_columnar(sql: str, conn: sqlite3.Connection, params=None,
+                      batch_size: int = 2000) -> pd.DataFrame:
+    """Load a query into a DataFrame without pd.read_sql's row records.
+
+    Rows are fetched with fetchmany and copied column-wise into typed NumPy
+    buffers picked from the declared column types, so pandas never builds
+    a full list of row tuples or runs a dtype inference pass. Columns that
+    don't match a declared table column (expressions, aliases) load as
+    object.
+    """
+    cursor = conn.execute(sql, params or ())
+    names: List[str] = [description[0] for description in cursor.description]
+    types = declared_column_types(conn)
+    capacity = max(batch_size, 65536)
+    buffers = [ColumnBuffer(column_kind(types.get(name.lower())), capacity) for name in names]
+    filled = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        if filled + len(rows) > capacity:
+            capacity = max(2 * capacity, filled + len(rows))
+            for buffer in buffers:
+                buffer.grow(capacity)
+        for buffer, values in zip(buffers, zip(*rows)):
+            buffer.put(filled, values)
+        filled += len(rows)
+    cursor.close()
+    df = pd.DataFrame({i: buffer.finish(filled) for i, buffer in enumerate(buffers)}, copy=False)
+    df.columns = names
+    return df
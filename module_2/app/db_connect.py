@@ -1,15 +1,269 @@
 import sqlite3
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
 import pandas as pd
 from sqlalchemy import create_engine, text
 import os
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional
 
+from cache import ResultCache, cache_key
+from encoding import COMPRESS_MIN_BYTES, compress, encode_records
+from sql import INDEXES, QUERIES
+
 
 curr_path = os.path.dirname(os.path.abspath(__file__)) # current file path dirname
 
 db_path = os.path.join(curr_path,'database/VR.db')
 
+# Applied once to every new pooled connection
+PRAGMAS = {
+    "journal_mode": "WAL",      # readers don't block the writer
+    "synchronous": "NORMAL",    # safe with WAL, far fewer fsyncs
+    "cache_size": -16000,       # ~16MB page cache per connection
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,     # 256MB memory-mapped reads
+    "busy_timeout": 5000,
+}
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that remembers when it was last handed out and
+    which registry queries it has already prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared_queries = set()
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared by the API workers."""
+
+    def __init__(self, db_path: str, max_size: int = 8, idle_timeout: float = 300.0,
+                 checkout_timeout: float = 10.0, pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self._idle = deque()    # most recently returned connection on the right
+        self._size = 0          # open connections, idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _connect(self) -> PooledConnection:
+        """Open a new connection and apply the pragmas."""
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection, check_same_thread=False,
+                               cached_statements=max(128, 2 * len(QUERIES)))
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: PooledConnection) -> bool:
+        """Cheap liveness probe run before a connection is handed out."""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _evict_idle(self) -> List[PooledConnection]:
+        """Pop connections idle for longer than idle_timeout (caller holds the lock)."""
+        expired = []
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft())
+            self._size -= 1
+        return expired
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Check out a connection, waiting up to timeout seconds for a free slot."""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                expired = self._evict_idle()
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No connection available within {timeout}s")
+                self._cond.wait(remaining)
+        for stale in expired:
+            stale.close()
+
+        if conn is not None and not self._is_healthy(conn):
+            conn.close()
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        conn.last_used = time.monotonic()
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, rolling back anything left open."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; nested calls on the same thread reuse it."""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self.acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle),
+                    "in_use": self._size - len(self._idle), "max_size": self.max_size}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(**kwargs) -> ConnectionPool:
+    """Create the shared pool (called from the FastAPI lifespan)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(db_path, **kwargs)
+        return _pool
+
+
+def get_pool() -> ConnectionPool:
+    return _pool if _pool is not None else init_pool()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def ensure_indexes():
+    """Create the indexes the registry queries rely on, if missing."""
+    with get_pool().connection() as conn:
+        for ddl in INDEXES:
+            conn.execute(ddl)
+        conn.commit()
+
+
+_cache = None
+
+
+def init_cache(**kwargs) -> ResultCache:
+    """Create the shared result cache (called from the FastAPI lifespan)."""
+    global _cache
+    with _pool_lock:
+        if _cache is None:
+            _cache = ResultCache(db_path, **kwargs)
+        return _cache
+
+
+def get_cache() -> ResultCache:
+    return _cache if _cache is not None else init_cache()
+
+
+def close_cache():
+    global _cache
+    with _pool_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+_executor = None
+
+
+def init_executor(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """Create the worker threads that run blocking queries for async handlers.
+
+    Defaults to one worker per pooled connection, so at most max_size queries
+    run at once and a worker never blocks waiting on the pool.
+    """
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            workers = max_workers or (_pool.max_size if _pool is not None else 8)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        return _executor
+
+
+def get_executor() -> ThreadPoolExecutor:
+    return _executor if _executor is not None else init_executor()
+
+
+def close_executor():
+    global _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking database call on the query executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
 
 def connection_to_db(db_path):
     return_response = {
@@ -23,24 +277,138 @@ def connection_to_db(db_path):
         return return_response
     except:
         return return_response
-    
+
 
 def read_sql_query(sql,conn):
     df = pd.read_sql(sql=sql,con=conn)
     return df
 
 def get_data(sql):
-    connecter = connection_to_db(db_path=db_path)
-    if connecter['connection']!=0:
-        df = read_sql_query(sql=sql,conn=connecter['connection'])
-        return df
-    else:
+    try:
+        with get_pool().connection() as conn:
+            df = read_sql_query(sql=sql,conn=conn)
+            return df
+    except (sqlite3.Error, TimeoutError, RuntimeError):
+        return None
+
+
+def get_rows(name, **params):
+    """Run a registry query and return (columns, rows) straight from the cursor."""
+    try:
+        with get_pool().connection() as conn:
+            sql, bound = QUERIES.prepare(conn, name, params)
+            started = time.perf_counter()
+            cursor = conn.execute(sql, bound)
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+            QUERIES.record(name, time.perf_counter() - started, len(rows))
+            return columns, rows
+    except (sqlite3.Error, TimeoutError, RuntimeError):
         return None
 
 
+async def get_rows_async(name, **params):
+    return await run_in_db_thread(get_rows, name, **params)
+
+
+def get_query_cached(name, encode, params=None):
+    """Return encode(columns, rows) for a registry query, serving it from the
+    result cache while the database is unchanged."""
+    params = params or {}
+    cache = get_cache()
+    key = cache_key(name, params)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+    version = cache.data_version()
+    result = get_rows(name, **params)
+    if result is None:
+        return None
+    payload = encode(*result)
+    cache.put(key, payload, version)
+    return payload
+
+
+def get_query_encoded(name, params=None, content_encoding=None):
+    """Return (body, content_encoding) for a registry query as JSON records,
+    compressed when the client accepts it; both forms are cached."""
+    cache = get_cache()
+    version = cache.data_version()
+    body = get_query_cached(name, encode_records, params)
+    if body is None:
+        return None
+    if content_encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    key = (cache_key(name, params), content_encoding)
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(body, content_encoding)
+        cache.put(key, compressed, version)
+    return compressed, content_encoding
+
+
+def iter_row_batches(name, key_column, params=None, batch_size: int = 500,
+                     cursor_param: str = "after_id", first=None):
+    """Yield (columns, rows) of a keyset page query, batch_size rows at a time.
+
+    Every batch is its own page query on a connection borrowed just for it,
+    so a slow streaming client holds no pooled connection between batches
+    and can't starve the other endpoints. first is an already fetched first
+    page, letting the caller answer with an error before the response
+    starts; a page that fails later raises and aborts the stream.
+    """
+    params = dict(params or {})
+    after = params.pop(cursor_param, 0)
+    result = first
+    while True:
+        if result is None:
+            result = get_rows(name, **params, **{cursor_param: after, "limit": batch_size})
+            if result is None:
+                raise RuntimeError(f"Query {name!r} failed while streaming")
+        columns, rows = result
+        if not rows:
+            return
+        yield columns, rows
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][columns.index(key_column)]
+        result = None
+
+
+def _close_after(step, close):
+    """Close an iterator once its in-flight step (if any) has returned."""
+    if step is not None:
+        wait([step])
+    close()
+
+
+async def aiter_in_db_thread(iterator):
+    """Drive a blocking iterator from async code, one step per executor call.
+
+    If the consumer goes away (client disconnect, cancellation) while a
+    step is still running in a worker thread, the iterator is only closed
+    after that step returns: a generator can't be closed while another
+    thread is inside it, and closing is what releases its connection.
+    """
+    done = object()
+    step = None
+    try:
+        while True:
+            step = get_executor().submit(next, iterator, done)
+            item = await asyncio.wrap_future(step)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            # shielded, so a second cancellation can't skip the close
+            await asyncio.shield(run_in_db_thread(_close_after, step, close))
+
+
 if __name__ == "__main__":
     sql = "SELECT * FROM EMPLOYEES;"
-    connecter = connection_to_db(db_path=db_path)
-    df=read_sql_query(sql=sql,conn=connecter['connection'])
+    df = get_data(sql)
     print(df)
-    
\ No newline at end of file
+    print(get_pool().stats())
+    close_pool()
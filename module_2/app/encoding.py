@@ -0,0 +1,85 @@
+import json
+import zlib
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, same output
+    orjson = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+# zlib window bits for each supported Content-Encoding
+ZLIB_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def encode_records(columns: Sequence[str], rows: Iterable[tuple]) -> bytes:
+    """Encode cursor rows straight to a JSON array of records."""
+    return dumps([dict(zip(columns, row)) for row in rows])
+
+
+def ndjson_chunks(batches):
+    """Encode row batches as newline-delimited JSON, one chunk per batch."""
+    for columns, rows in batches:
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def json_array_chunks(batches):
+    """Encode row batches as a JSON array of records, streamed piece by piece."""
+    yield b"["
+    first = True
+    for columns, rows in batches:
+        chunk = dumps([dict(zip(columns, row)) for row in rows])[1:-1]
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick gzip or deflate from an Accept-Encoding header, honouring q-values."""
+    best, best_q = None, 0.0
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        candidates = list(ZLIB_WBITS) if name == "*" else [name]
+        for candidate in candidates:
+            if candidate in ZLIB_WBITS and q > best_q:
+                best, best_q = candidate, q
+    return best
+
+
+def compress(body: bytes, content_encoding: str, level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, ZLIB_WBITS[content_encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def maybe_compress(body: bytes, content_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress body if the client accepts it and it is big enough to pay off."""
+    if content_encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    return compress(body, content_encoding), content_encoding
+
+
+def json_response(body: bytes, content_encoding: Optional[str] = None,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Send already-encoded JSON bytes as-is."""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    if content_encoding is not None:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type="application/json", headers=headers)
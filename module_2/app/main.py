@@ -1,15 +1,35 @@
 import pandas as pd
 import os
-from fastapi import FastAPI, HTTPException, Request, Body
-from pydantic import BaseModel
+import json
+import base64
+import binascii
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import FastAPI, HTTPException, Request, Body, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
 from db_connect import *
+from encoding import *
 from sql import *
 
 class HigherSalary(BaseModel):
-    salary:str
+    salary:float
+    limit:Optional[int] = Field(None, ge=1, le=1000)
+    cursor:Optional[str] = None
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_pool()
+    ensure_indexes()
+    init_cache()
+    init_executor()
+    yield
+    close_executor()
+    close_cache()
+    close_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/ping")
 def main():
@@ -20,11 +40,65 @@ def main():
 
  
 
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, types):
+    # one value per key column, each of the expected type (bools aren't ids)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        values = None
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(isinstance(value, kind) and not isinstance(value, bool)
+                       for value, kind in zip(values, types))):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+NUMBER = (int, float)
+EMPLOYEES_CURSOR = (int,)                       # employee_id
+HIGH_SALARY_CURSOR = (NUMBER, str, str, int)    # salary, first_name, last_name, employee_id
+
+def page_response(result, limit, key_columns, accept_encoding, columns=None):
+    # one extra row is fetched to tell whether another page exists
+    names, rows = result
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor([rows[-1][names.index(c)] for c in key_columns])
+    if columns is not None:
+        keep = [names.index(c) for c in columns]
+        names, rows = columns, [tuple(row[i] for i in keep) for row in rows]
+    body, content_encoding = maybe_compress(encode_records(names, rows),
+                                            negotiate_encoding(accept_encoding))
+    return json_response(body, content_encoding, headers)
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
 @app.get("/employees")
-async def get_employees_info():
-    df = get_data(TASK1)
-    if isinstance(df,pd.DataFrame):
-        return df.to_json(orient='records')
+async def get_employees_info(request: Request,
+                             stream: Optional[Literal["ndjson", "json"]] = None,
+                             batch_size: int = Query(500, ge=1, le=10000),
+                             limit: Optional[int] = Query(None, ge=1, le=1000),
+                             cursor: Optional[str] = None):
+    if stream is not None:
+        first = await get_rows_async("employees_page", after_id=0, limit=batch_size)
+        if first is None:
+            raise HTTPException(status_code=500,detail="Internal Error, check the connections")
+        batches = iter_row_batches("employees_page", "employee_id", batch_size=batch_size, first=first)
+        encode = ndjson_chunks if stream == "ndjson" else json_array_chunks
+        return StreamingResponse(aiter_in_db_thread(encode(batches)),
+                                 media_type=STREAM_MEDIA_TYPES[stream])
+    if limit is not None:
+        after_id = decode_cursor(cursor, EMPLOYEES_CURSOR)[0] if cursor else 0
+        result = await get_rows_async("employees_page", after_id=after_id, limit=limit + 1)
+        if result is None:
+            raise HTTPException(status_code=500,detail="Internal Error, check the connections")
+        return page_response(result, limit, ["employee_id"], request.headers.get("accept-encoding"))
+    content_encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    result = await run_in_db_thread(get_query_encoded, "employees", None, content_encoding)
+    if result is not None:
+        return json_response(*result)
     else:
         raise HTTPException(status_code=500,detail="Internal Error, check the connections")
     
@@ -32,12 +106,41 @@ async def get_employees_info():
 
  
 @app.post("/employees/highsalary")
-async def highersalaryemployee(hsalary: HigherSalary):
-    global TASK2
-    task2 = TASK2+str(hsalary.salary)
-    df = get_data(task2)
-    if isinstance(df,pd.DataFrame):
-        return df.to_json(orient='records')
+async def highersalaryemployee(request: Request, hsalary: HigherSalary):
+    if hsalary.limit is not None:
+        if hsalary.cursor:
+            after = decode_cursor(hsalary.cursor, HIGH_SALARY_CURSOR)
+            if after[0] <= hsalary.salary:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            result = await get_rows_async("high_salary_next_page", after_salary=after[0],
+                                          after_first_name=after[1], after_last_name=after[2],
+                                          after_id=after[3], limit=hsalary.limit + 1)
+        else:
+            result = await get_rows_async("high_salary_first_page", salary=hsalary.salary,
+                                          limit=hsalary.limit + 1)
+        if result is None:
+            raise HTTPException(status_code=500,detail="Internal Error, check the connections")
+        return page_response(result, hsalary.limit, ["salary", "first_name", "last_name", "employee_id"],
+                             request.headers.get("accept-encoding"), columns=["first_name", "last_name"])
+    content_encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    result = await run_in_db_thread(get_query_encoded, "high_salary_employees",
+                                    {"salary": hsalary.salary}, content_encoding)
+    if result is not None:
+        return json_response(*result)
     else:
         raise HTTPException(status_code=500,detail="Internal Error, check the connections")
 
+
+
+@app.get("/stats")
+def database_stats():
+    return {"pool": get_pool().stats(), "statements": QUERIES.stats(),
+            "cache": get_cache().stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    lines = [QUERIES.to_prometheus().rstrip("\n")]
+    for group, stats in (("pool", get_pool().stats()), ("cache", get_cache().stats())):
+        lines.extend(f"app_{group}_{name} {value}" for name, value in stats.items())
+    return "\n".join(lines) + "\n"
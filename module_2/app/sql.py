@@ -1,3 +1,136 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, NamedTuple, Tuple
+
 EMPLOYEES_QUERY = "SELECT * FROM EMPLOYEES;"
-TASK1 = "SELECT * FROM EMPLOYEES;"
-TASK2 = "SELECT first_name,last_name from EMPLOYEES where salary > "
\ No newline at end of file
+TASK1 = EMPLOYEES_QUERY
+TASK2 = "SELECT first_name,last_name from EMPLOYEES where salary > :salary"
+
+# Keyset pages: the cursor is the sort key of the last row already returned
+EMPLOYEES_PAGE = ("SELECT * FROM EMPLOYEES WHERE employee_id > :after_id "
+                  "ORDER BY employee_id LIMIT :limit")
+HIGH_SALARY_FIRST_PAGE = ("SELECT first_name,last_name,salary,employee_id FROM EMPLOYEES "
+                          "WHERE salary > :salary "
+                          "ORDER BY salary,first_name,last_name,employee_id LIMIT :limit")
+HIGH_SALARY_NEXT_PAGE = ("SELECT first_name,last_name,salary,employee_id FROM EMPLOYEES "
+                         "WHERE (salary,first_name,last_name,employee_id) > "
+                         "(:after_salary,:after_first_name,:after_last_name,:after_id) "
+                         "ORDER BY salary,first_name,last_name,employee_id LIMIT :limit")
+
+# Created at startup; the salary index covers every high-salary page query
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_employees_salary_name "
+    "ON employees(salary, first_name, last_name)",
+]
+
+
+class NamedQuery(NamedTuple):
+    name: str
+    sql: str
+    params: Tuple[str, ...] = ()
+
+
+class QueryRegistry:
+    """Named SQL statements with bound parameters.
+
+    SQL text never changes between calls, so sqlite3's per-connection
+    statement cache prepares each query once per pooled connection and
+    reuses the plan afterwards. The first run of a query on a connection
+    counts as a miss, every later run as a hit. Executions also record
+    latency and row counts for the /metrics endpoint.
+    """
+
+    LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._queries: Dict[str, NamedQuery] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, sql: str, params: Tuple[str, ...] = ()) -> NamedQuery:
+        query = NamedQuery(name, sql, tuple(params))
+        self._queries[name] = query
+        self._counters[name] = {"hits": 0, "misses": 0, "count": 0, "seconds": 0.0, "rows": 0,
+                                "buckets": [0] * (len(self.LATENCY_BUCKETS) + 1)}
+        return query
+
+    def get(self, name: str) -> NamedQuery:
+        try:
+            return self._queries[name]
+        except KeyError:
+            raise KeyError(f"Unknown query: {name}") from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def bind(self, name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Check params against the query's declared parameters."""
+        query = self.get(name)
+        missing = [p for p in query.params if p not in params]
+        unknown = [p for p in params if p not in query.params]
+        if missing or unknown:
+            raise ValueError(f"Query {name!r} expects {list(query.params)}, "
+                             f"missing {missing}, unexpected {unknown}")
+        return {p: params[p] for p in query.params}
+
+    def prepare(self, conn, name: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Return (sql, bound params) for conn and record a statement-cache hit or miss."""
+        query = self.get(name)
+        bound = self.bind(name, params)
+        prepared = conn.prepared_queries
+        with self._lock:
+            if name in prepared:
+                self._counters[name]["hits"] += 1
+            else:
+                prepared.add(name)
+                self._counters[name]["misses"] += 1
+        return query.sql, bound
+
+    def record(self, name: str, seconds: float, rows: int):
+        """Account one execution of a query."""
+        with self._lock:
+            counters = self._counters[name]
+            counters["count"] += 1
+            counters["seconds"] += seconds
+            counters["rows"] += rows
+            counters["buckets"][bisect_left(self.LATENCY_BUCKETS, seconds)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_query = {name: dict(c, buckets=list(c["buckets"])) for name, c in self._counters.items()}
+        return {
+            "hits": sum(c["hits"] for c in per_query.values()),
+            "misses": sum(c["misses"] for c in per_query.values()),
+            "queries": per_query,
+        }
+
+    def to_prometheus(self, prefix: str = "app") -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        queries = self.stats()["queries"]
+        lines = [f"# TYPE {prefix}_query_duration_seconds histogram"]
+        for name, c in queries.items():
+            cumulative = 0
+            for limit, count in zip(self.LATENCY_BUCKETS, c["buckets"]):
+                cumulative += count
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{query="{name}",le="{limit}"}} {cumulative}')
+            lines.append(f'{prefix}_query_duration_seconds_bucket{{query="{name}",le="+Inf"}} {c["count"]}')
+            lines.append(f'{prefix}_query_duration_seconds_sum{{query="{name}"}} {c["seconds"]}')
+            lines.append(f'{prefix}_query_duration_seconds_count{{query="{name}"}} {c["count"]}')
+        for metric, key, kind in (("query_rows_total", "rows", "counter"),
+                                  ("statement_cache_hits_total", "hits", "counter"),
+                                  ("statement_cache_misses_total", "misses", "counter")):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            lines.extend(f'{prefix}_{metric}{{query="{name}"}} {c[key]}' for name, c in queries.items())
+        return "\n".join(lines) + "\n"
+
+
+QUERIES = QueryRegistry()
+QUERIES.register("employees", TASK1)
+QUERIES.register("high_salary_employees", TASK2, params=("salary",))
+QUERIES.register("employees_page", EMPLOYEES_PAGE, params=("after_id", "limit"))
+QUERIES.register("high_salary_first_page", HIGH_SALARY_FIRST_PAGE, params=("salary", "limit"))
+QUERIES.register("high_salary_next_page", HIGH_SALARY_NEXT_PAGE,
+                 params=("after_salary", "after_first_name", "after_last_name", "after_id", "limit"))